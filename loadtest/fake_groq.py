@@ -0,0 +1,76 @@
+# loadtest/fake_groq.py
+#
+# A stand-in for the Groq (OpenAI-compatible) chat completions API. It sleeps
+# for a configurable time-to-first-token plus completion_tokens / token_rate,
+# then returns a canned completion with realistic usage counts. Point the GenAI
+# service at it with GROQ_BASE_URL=http://localhost:<port>.
+
+import os
+import time
+import uuid
+import logging
+import argparse
+from flask import Flask, request, jsonify
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+app = Flask(__name__)
+
+CONFIG = {
+    "latency_ms": float(os.environ.get("FAKE_LLM_LATENCY_MS", 300)),
+    "tokens_per_sec": float(os.environ.get("FAKE_LLM_TOKENS_PER_SEC", 250)),
+    "completion_tokens": int(os.environ.get("FAKE_LLM_COMPLETION_TOKENS", 150)),
+}
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), good enough for load shaping."""
+    return max(1, len(text) // 4)
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "ok", "service": "fake-groq"})
+
+
+@app.route('/openai/v1/chat/completions', methods=['POST'])
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.json or {}
+    messages = data.get("messages", [])
+    prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+    completion_tokens = min(CONFIG["completion_tokens"], int(data.get("max_tokens") or CONFIG["completion_tokens"]))
+
+    time.sleep(CONFIG["latency_ms"] / 1000 + completion_tokens / CONFIG["tokens_per_sec"])
+
+    content = ("Based on the provided context, a diversified allocation across large-cap equity "
+               "and short-duration debt suits a moderate risk profile. ") * max(1, completion_tokens // 25)
+    return jsonify({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": data.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content.strip()},
+            "logprobs": None,
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Groq/OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5010)))
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--tokens-per-sec", type=float, default=CONFIG["tokens_per_sec"])
+    parser.add_argument("--completion-tokens", type=int, default=CONFIG["completion_tokens"])
+    args = parser.parse_args()
+    CONFIG.update(latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec,
+                  completion_tokens=args.completion_tokens)
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
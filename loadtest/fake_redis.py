@@ -0,0 +1,29 @@
+# loadtest/fake_redis.py
+#
+# In-memory Redis substitute speaking the real wire protocol (via fakeredis),
+# so services connect through REDIS_URL unchanged. Lua scripting (used by the
+# gateway rate limiter) requires the `lupa` extra: pip install "fakeredis[lua]".
+
+import os
+import sys
+import argparse
+from fakeredis import FakeRedis, TcpFakeServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api-gateway"))
+
+from rate_limiter import TOKEN_BUCKET_SCRIPT  # noqa: E402
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="In-memory Redis substitute")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 6390)))
+    args = parser.parse_args()
+    # socketserver's default listen backlog of 5 drops connects when a stage
+    # ramps up many pooled clients at once
+    TcpFakeServer.request_queue_size = 128
+    server = TcpFakeServer(("127.0.0.1", args.port), server_type="redis")
+    server.daemon_threads = True
+    # fakeredis closes the connection after any error reply, including the
+    # NOSCRIPT that precedes a client's first EVALSHA, so preload the script
+    FakeRedis(server=server.fake_server).script_load(TOKEN_BUCKET_SCRIPT)
+    server.serve_forever()
@@ -0,0 +1,422 @@
+# loadtest/harness.py
+#
+# End-to-end load harness for the chat path. Boots the API Gateway, GenAI and
+# Market Data services against local stand-ins (fake Groq, replayed yfinance
+# feed, SQLite, in-memory Redis), drives a register/login/chat mix at
+# increasing concurrency and writes a JSON results file for tracking capacity
+# over time.
+#
+# Usage:
+#   pip install -r services/api-gateway/requirements.txt \
+#               -r services/genai-inference-service/requirements.txt \
+#               -r services/market-data-service/requirements.txt \
+#               -r loadtest/requirements.txt
+#   python loadtest/harness.py --stages 1,2,4,8,16,32 --stage-seconds 20
+#
+# Pass --gateway-url to drive an already running stack instead of booting one.
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import collections
+from datetime import datetime, timezone
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOADTEST_DIR = os.path.join(ROOT, "loadtest")
+SERVICES_DIR = os.path.join(ROOT, "services")
+
+SCHEMA_VERSION = 3  # v2: fallback answers count as errors; v3: exact nearest-rank percentiles
+
+TICKERS = ["RELIANCE", "TCS", "INFY", "HDFCBANK", "ICICIBANK", "SBIN", "ITC", "LT"]
+QUERIES = [
+    "What is the outlook for {t} this quarter?",
+    "Should I add {t} to my SIP portfolio?",
+    "How volatile has {t} been recently?",
+    "Compare {t} with an index fund for a 5 year horizon.",
+    "Explain how SEBI regulations affect {t} shareholders.",
+    "Is {t} a good hedge against inflation?",
+]
+
+# Relative weights of actions taken by each virtual user after its first login.
+DEFAULT_MIX = {"chat": 0.85, "login": 0.10, "register": 0.05}
+
+
+# --- Stack management ---
+class Stack:
+    """Boots the stand-ins and the three services as subprocesses."""
+
+    def __init__(self, base_port: int, llm_latency_ms: float, llm_tokens_per_sec: float,
+                 replay_file: str = None, keep_rate_limits: bool = False, log_dir: str = None):
+        self.ports = {
+            "gateway": base_port,
+            "market": base_port + 1,
+            "genai": base_port + 2,
+            "groq": base_port + 10,
+            "redis": base_port + 20,
+        }
+        self.llm_latency_ms = llm_latency_ms
+        self.llm_tokens_per_sec = llm_tokens_per_sec
+        self.replay_file = replay_file
+        self.keep_rate_limits = keep_rate_limits
+        self.workdir = tempfile.mkdtemp(prefix="finsense-load-")
+        self.log_dir = log_dir or self.workdir
+        self.procs = []
+
+    @property
+    def gateway_url(self) -> str:
+        return f"http://127.0.0.1:{self.ports['gateway']}"
+
+    def _spawn(self, name: str, args: list, cwd: str, env: dict) -> None:
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        full_env = {**os.environ, **env}
+        proc = subprocess.Popen([sys.executable] + args, cwd=cwd, env=full_env, stdout=log, stderr=subprocess.STDOUT)
+        self.procs.append((name, proc, log))
+
+    def start(self) -> None:
+        redis_url = f"redis://127.0.0.1:{self.ports['redis']}/0"
+        self._spawn("fake-redis", [os.path.join(LOADTEST_DIR, "fake_redis.py"), "--port", str(self.ports["redis"])],
+                    LOADTEST_DIR, {})
+        self._spawn("fake-groq", [os.path.join(LOADTEST_DIR, "fake_groq.py"), "--port", str(self.ports["groq"]),
+                                  "--latency-ms", str(self.llm_latency_ms),
+                                  "--tokens-per-sec", str(self.llm_tokens_per_sec)],
+                    LOADTEST_DIR, {})
+        if not wait_for_port(self.ports["redis"]):
+            self.stop()
+            raise RuntimeError(f"fake-redis did not start listening; see logs in {self.log_dir}")
+
+        market_env = {
+            "PORT": str(self.ports["market"]),
+            "METRICS_ENABLED": "1",
+            "REDIS_URL": redis_url,
+            "PYTHONPATH": os.pathsep.join([os.path.join(LOADTEST_DIR, "standins"), os.environ.get("PYTHONPATH", "")]),
+        }
+        if self.replay_file:
+            market_env["REPLAY_FEED_FILE"] = os.path.abspath(self.replay_file)
+        self._spawn("market-data-service", ["app.py"], os.path.join(SERVICES_DIR, "market-data-service"), market_env)
+
+        self._spawn("genai-inference-service", ["app.py"], os.path.join(SERVICES_DIR, "genai-inference-service"), {
+            "PORT": str(self.ports["genai"]),
+            "METRICS_ENABLED": "1",
+            "GROQ_API_KEY": "load-test",
+            "GROQ_BASE_URL": f"http://127.0.0.1:{self.ports['groq']}",
+            "MARKET_DATA_URL": f"http://127.0.0.1:{self.ports['market']}",
+        })
+
+        gateway_env = {
+            "PORT": str(self.ports["gateway"]),
+            "METRICS_ENABLED": "1",
+            "REDIS_URL": redis_url,
+            "DATABASE_URL": f"sqlite:///{os.path.join(self.workdir, 'finsense.db')}",
+            "GENAI_SERVICE_URL": f"http://127.0.0.1:{self.ports['genai']}",
+        }
+        if not self.keep_rate_limits:
+            # Every virtual user shares one client IP; lift limits so they don't dominate results.
+            gateway_env.update({f"RATE_LIMIT_{r}": "1000000/1" for r in ("CHAT", "LOGIN", "REGISTER", "DEFAULT")})
+        self._spawn("api-gateway", ["app.py"], os.path.join(SERVICES_DIR, "api-gateway"), gateway_env)
+
+        # Not every service has /health; /metrics (enabled above) is common to all of them.
+        for name, port, path in (("fake-groq", self.ports["groq"], "/health"),
+                                 ("market-data-service", self.ports["market"], "/metrics"),
+                                 ("genai-inference-service", self.ports["genai"], "/metrics"),
+                                 ("api-gateway", self.ports["gateway"], "/metrics")):
+            if not wait_for_http(f"http://127.0.0.1:{port}{path}"):
+                self.stop()
+                raise RuntimeError(f"{name} did not become healthy; see logs in {self.log_dir}")
+        self.check_alive()
+
+    def check_alive(self) -> None:
+        """
+        Raises if any stand-in or service has exited. Services degrade silently
+        without Redis, so a dead stand-in would otherwise skew the results.
+        """
+        dead = [f"{name} (exit {proc.returncode})" for name, proc, _ in self.procs if proc.poll() is not None]
+        if dead:
+            self.stop()
+            raise RuntimeError(f"Process exited: {', '.join(dead)}; see logs in {self.log_dir}")
+
+    def stop(self) -> None:
+        for name, proc, log in reversed(self.procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+        self.procs = []
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def wait_for_http(url: str, timeout: float = 60.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+# --- Workload ---
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (endpoint, status, latency_seconds, fallback)
+
+    def add(self, endpoint: str, status: int, latency: float, fallback: bool = False) -> None:
+        with self.lock:
+            self.samples.append((endpoint, status, latency, fallback))
+
+    def drain(self) -> list:
+        with self.lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+class VirtualUser(threading.Thread):
+    """Registers, logs in, then loops over the action mix until stopped."""
+
+    def __init__(self, base_url: str, recorder: Recorder, stop: threading.Event, mix: dict, think_ms: float, seed: int):
+        super().__init__(daemon=True)
+        self.api = base_url.rstrip("/") + "/api/v1"
+        self.recorder = recorder
+        self.stop_event = stop
+        self.mix = mix
+        self.think_ms = think_ms
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.username = f"load_{uuid.uuid4().hex[:12]}"
+        self.password = "load-test-password"
+        self.token = None
+
+    def _call(self, endpoint: str, path: str, payload: dict, headers: dict = None):
+        start = time.perf_counter()
+        try:
+            res = self.session.post(f"{self.api}/{path}", json=payload, headers=headers, timeout=60)
+            status = res.status_code
+        except requests.RequestException:
+            res, status = None, 0
+        # The gateway answers 200 with a canned message when the AI service fails; count those as errors.
+        fallback = res is not None and res.headers.get("X-AI-Fallback") == "true"
+        self.recorder.add(endpoint, status, time.perf_counter() - start, fallback)
+        return res
+
+    def register(self, username: str) -> None:
+        self._call("register", "register", {"username": username, "password": self.password})
+
+    def login(self) -> None:
+        res = self._call("login", "login", {"username": self.username, "password": self.password})
+        if res is not None and res.status_code == 200:
+            self.token = res.json().get("token")
+
+    def chat(self) -> None:
+        query = self.rng.choice(QUERIES).format(t=self.rng.choice(TICKERS))
+        self._call("chat", "chat", {"query": query},
+                   headers={"Authorization": self.token or "", "Idempotency-Key": uuid.uuid4().hex})
+
+    def run(self) -> None:
+        self.register(self.username)
+        self.login()
+        actions, weights = zip(*self.mix.items())
+        while not self.stop_event.is_set():
+            action = self.rng.choices(actions, weights)[0]
+            if action == "chat":
+                self.chat()
+            elif action == "login":
+                self.login()
+            else:
+                self.register(f"load_{uuid.uuid4().hex[:12]}")
+            if self.think_ms:
+                self.stop_event.wait(self.rng.expovariate(1000 / self.think_ms))
+
+
+# --- Reporting ---
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    # pct * n first keeps the product exact, so e.g. p95 of 100 samples is rank 95, not 96
+    rank = math.ceil(pct * len(sorted_values) / 100)
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(samples: list, concurrency: int, duration: float) -> dict:
+    by_endpoint = collections.defaultdict(list)
+    for endpoint, status, latency, fallback in samples:
+        by_endpoint[endpoint].append((status, latency, fallback))
+
+    endpoints = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(latency for _, latency, _ in rows)
+        fallbacks = sum(1 for _, _, fallback in rows if fallback)
+        errors = sum(1 for status, _, fallback in rows if status == 0 or status >= 400 or fallback)
+        endpoints[endpoint] = {
+            "requests": len(rows),
+            "errors": errors,
+            "fallbacks": fallbacks,
+            "throughput_rps": round(len(rows) / duration, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        }
+
+    total = len(samples)
+    errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(duration, 2),
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / duration, 3),
+        "endpoints": endpoints,
+    }
+
+
+def find_saturation(stages: list, min_gain: float, max_error_rate: float) -> dict:
+    """
+    The saturation point is the last stage before added concurrency stops paying
+    off: throughput grows by less than `min_gain` or the error rate exceeds
+    `max_error_rate`.
+    """
+    best = stages[0] if stages else None
+    for prev, cur in zip(stages, stages[1:]):
+        gain = (cur["throughput_rps"] - prev["throughput_rps"]) / prev["throughput_rps"] if prev["throughput_rps"] else 0
+        if cur["error_rate"] > max_error_rate or gain < min_gain:
+            return {"concurrency": prev["concurrency"], "throughput_rps": prev["throughput_rps"], "reached": True}
+        best = cur
+    if best is None:
+        return {"concurrency": None, "throughput_rps": None, "reached": False}
+    return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"], "reached": False}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_stage(stage: dict) -> None:
+    print(f"\nconcurrency={stage['concurrency']}  {stage['throughput_rps']} req/s  error_rate={stage['error_rate']:.2%}")
+    print(f"  {'endpoint':<10}{'reqs':>8}{'errs':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in stage["endpoints"].items():
+        print(f"  {name:<10}{e['requests']:>8}{e['errors']:>7}{e['throughput_rps']:>9}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+
+
+def run_stage(base_url: str, concurrency: int, seconds: float, mix: dict, think_ms: float, seed: int,
+              stack: Stack = None) -> dict:
+    recorder = Recorder()
+    stop = threading.Event()
+    users = [VirtualUser(base_url, recorder, stop, mix, think_ms, seed + i) for i in range(concurrency)]
+    for u in users:
+        u.start()
+    # Exclude each user's initial register/login from the measured window.
+    time.sleep(min(2.0, seconds / 4))
+    recorder.drain()
+    start = time.perf_counter()
+    stop.wait(seconds)
+    samples = recorder.drain()
+    duration = time.perf_counter() - start
+    stop.set()
+    for u in users:
+        u.join(timeout=65)
+    if stack:
+        stack.check_alive()
+    return summarize(samples, concurrency, duration)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FinSense end-to-end load harness")
+    parser.add_argument("--stages", default="1,2,4,8,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--stage-seconds", type=float, default=20.0)
+    parser.add_argument("--think-ms", type=float, default=100.0, help="Mean think time between actions")
+    parser.add_argument("--mix", default=None, help='Action weights as JSON, e.g. \'{"chat": 0.8, "login": 0.2}\'')
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gateway-url", default=None, help="Drive an existing stack instead of booting one")
+    parser.add_argument("--base-port", type=int, default=18000)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--replay-file", default=None, help="CSV market feed to replay instead of synthetic bars")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Keep the gateway's default rate limits")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="Throughput gain below which a stage is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", default=os.path.join(LOADTEST_DIR, "results"), help="Results directory")
+    args = parser.parse_args()
+
+    stages = [int(s) for s in args.stages.split(",") if s.strip()]
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+
+    stack = None
+    base_url = args.gateway_url
+    if not base_url:
+        stack = Stack(args.base_port, args.llm_latency_ms, args.llm_tokens_per_sec,
+                      replay_file=args.replay_file, keep_rate_limits=args.keep_rate_limits)
+        print(f"Booting stack (logs in {stack.log_dir})...")
+        stack.start()
+        base_url = stack.gateway_url
+
+    results = []
+    try:
+        for concurrency in stages:
+            stage = run_stage(base_url, concurrency, args.stage_seconds, mix, args.think_ms, args.seed, stack)
+            results.append(stage)
+            print_stage(stage)
+    finally:
+        if stack:
+            stack.stop()
+
+    saturation = find_saturation(results, args.min_gain, args.max_error_rate)
+    print(f"\nSaturation: concurrency={saturation['concurrency']} at {saturation['throughput_rps']} req/s"
+          + ("" if saturation["reached"] else " (not reached; add higher stages)"))
+
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            "stages": stages,
+            "stage_seconds": args.stage_seconds,
+            "think_ms": args.think_ms,
+            "mix": mix,
+            "seed": args.seed,
+            "target": "external" if args.gateway_url else "local-standins",
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_tokens_per_sec": args.llm_tokens_per_sec,
+            "replay_file": args.replay_file,
+        },
+        "stages": results,
+        "saturation": saturation,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"load-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
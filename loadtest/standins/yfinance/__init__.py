@@ -0,0 +1,110 @@
+# loadtest/standins/yfinance/__init__.py
+#
+# Replay stand-in for the subset of yfinance used by market-data-service. The
+# harness puts loadtest/standins first on PYTHONPATH so `import yfinance`
+# resolves here and no upstream calls are made.
+#
+# With REPLAY_FEED_FILE set, bars are replayed from a CSV with columns
+# symbol,timestamp,open,high,low,close,volume (recorded at the interval being
+# requested). Otherwise each symbol gets a deterministic random walk, so runs
+# are repeatable.
+
+import os
+import zlib
+import time
+import numpy as np
+import pandas as pd
+
+__version__ = "0.0-replay"
+
+TZ = "Asia/Kolkata"
+SESSION_MINUTES = 375  # 09:15 - 15:30 IST
+
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260,
+               "10y": 2520, "ytd": 200, "max": 2520}
+INTERVAL_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+
+LATENCY_SECONDS = float(os.environ.get("FAKE_YF_LATENCY_MS", 150)) / 1000
+
+_replay = None
+
+
+def _load_replay():
+    global _replay
+    if _replay is None:
+        path = os.environ.get("REPLAY_FEED_FILE")
+        if path:
+            df = pd.read_csv(path, parse_dates=["timestamp"])
+            df["symbol"] = df["symbol"].str.upper()
+            _replay = {sym: g.set_index("timestamp").drop(columns="symbol")
+                       .rename(columns=str.capitalize) for sym, g in df.groupby("symbol")}
+        else:
+            _replay = {}
+    return _replay
+
+
+def _synthetic(symbol: str, period: str, interval: str) -> pd.DataFrame:
+    days = PERIOD_DAYS.get(period, 1)
+    end = pd.Timestamp.now(tz=TZ).normalize()
+    sessions = pd.bdate_range(end=end, periods=days, tz=TZ)
+
+    if interval in INTERVAL_MINUTES:
+        step = INTERVAL_MINUTES[interval]
+        offsets = pd.to_timedelta(np.arange(0, SESSION_MINUTES, step) + 9 * 60 + 15, unit="m")
+        index = pd.DatetimeIndex([d + o for d in sessions for o in offsets])
+        sigma = 0.0008 * np.sqrt(step)
+    else:
+        index = sessions
+        sigma = 0.015
+
+    n = len(index)
+    rng = np.random.default_rng(zlib.crc32(f"{symbol}:{interval}".encode()))
+    base = 100 + zlib.crc32(symbol.encode()) % 3000
+    close = base * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, sigma, n)) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1_000, 50_000, n),
+    }, index=index)
+
+
+EMPTY_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _bars(ticker: str, period: str, interval: str) -> pd.DataFrame:
+    if ticker.startswith("INVALID"):
+        return pd.DataFrame(columns=EMPTY_COLUMNS)
+
+    replay = _load_replay()
+    if replay:
+        df = replay.get(ticker, replay.get(ticker.split(".")[0]))
+        if df is None:
+            return pd.DataFrame(columns=EMPTY_COLUMNS)
+        start = df.index[-1] - pd.Timedelta(days=PERIOD_DAYS.get(period, 1))
+        return df[df.index > start]
+
+    return _synthetic(ticker, period, interval)
+
+
+class Ticker:
+    def __init__(self, ticker: str):
+        self.ticker = ticker.upper()
+
+    def history(self, period: str = "1mo", interval: str = "1d", **kwargs) -> pd.DataFrame:
+        time.sleep(LATENCY_SECONDS)
+        return _bars(self.ticker, period, interval)
+
+
+def download(tickers, period: str = "1mo", interval: str = "1d", **kwargs) -> pd.DataFrame:
+    """Batch fetch: one simulated upstream round trip regardless of the number of tickers."""
+    symbols = [t.upper() for t in (tickers.split() if isinstance(tickers, str) else tickers)]
+    time.sleep(LATENCY_SECONDS)
+    frames = {symbol: _bars(symbol, period, interval) for symbol in symbols}
+    if len(frames) == 1:
+        return frames[symbols[0]]
+    # yfinance layout: (Price, Ticker) column MultiIndex
+    return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
@@ -1,9 +1,14 @@
 import os, sys, time, requests, logging, jwt
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from rate_limiter import RateLimiter, LoadShedder, Overloaded
+from idempotency import Deduplicator, IdempotencyConflict, fingerprint
+import metrics
+from metrics import timed
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +16,7 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
+metrics.init_app(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'finsense_default_secret_key')
@@ -18,6 +24,19 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
+rate_limiter = RateLimiter()
+chat_shedder = LoadShedder()
+deduplicator = Deduplicator()
+
+# Behind a reverse proxy or load balancer every request arrives from the proxy's
+# address, so anonymous clients would share one login/register bucket. Set this to
+# the number of proxies in front of the gateway to key them on X-Forwarded-For.
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 300))
+DEDUP_WINDOW = int(os.getenv('DEDUP_WINDOW', 10))
 
 # --- Models ---
 class User(db.Model):
@@ -53,6 +72,54 @@ def setup_database():
         print("!!! CRITICAL: COULD NOT CONNECT TO DATABASE !!!")
         sys.exit(1)
 
+# --- Auth ---
+def auth_payload():
+    """
+    Decodes the request's Authorization JWT once; rate limiting and the view
+    share the result via g. Raises jwt.InvalidTokenError for a bad token.
+    """
+    if 'jwt_result' not in g:
+        try:
+            with timed("jwt_decode"):
+                g.jwt_result = jwt.decode(request.headers.get('Authorization'), app.config['SECRET_KEY'],
+                                          algorithms=["HS256"])
+        except jwt.InvalidTokenError as e:
+            g.jwt_result = e
+    if isinstance(g.jwt_result, Exception):
+        raise g.jwt_result
+    return g.jwt_result
+
+# --- Rate Limiting & Load Shedding ---
+def client_identity():
+    """Rate-limit identity: the JWT user if the token is valid, else the client IP."""
+    if request.headers.get('Authorization'):
+        try:
+            return f"user:{auth_payload()['u_id']}"
+        except Exception:
+            pass
+    return f"ip:{request.remote_addr}"
+
+@app.before_request
+def enforce_limits():
+    # CORS preflights never reach a view; let flask_cors answer them for free
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+
+    identity = client_identity()
+    with timed("rate_limit_check"):
+        result = rate_limiter.check(identity, request.endpoint or 'default')
+    g.rate_limit_headers = result.headers()
+    if not result.allowed:
+        metrics.RATE_LIMITED.labels(metrics.SERVICE, "rate_limit").inc()
+        return jsonify({"error": "Rate limit exceeded"}), 429
+    return None
+
+@app.after_request
+def add_rate_limit_headers(response):
+    for name, value in g.get('rate_limit_headers', {}).items():
+        response.headers[name] = value
+    return response
+
 # --- Routes ---
 @app.route('/')
 def home():
@@ -75,7 +142,8 @@ def register():
     hashed_pw = generate_password_hash(data['password'])
     new_user = User(username=data['username'], password=hashed_pw)
     db.session.add(new_user)
-    db.session.commit()
+    with timed("db_commit"):
+        db.session.commit()
     return jsonify({"message": "User registered"}), 201
 
 @app.route('/api/v1/login', methods=['POST'])
@@ -100,53 +168,95 @@ def chat():
     if not token: return jsonify({"error": "No token"}), 401
     
     try:
-        # 1. Verify Token
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-        u_id = payload['u_id']
+        # 1. Verify Token (already decoded by enforce_limits)
+        u_id = auth_payload()['u_id']
         
         # 2. Get Data
         data = request.json
         user_query = data.get('query')
 
-        # 3. Connect to AI Service (FIXED LOGIC)
-        # Use the Environment Variable, NOT the hardcoded URL
-        genai_url = os.getenv('GENAI_SERVICE_URL')
-        
-        if not genai_url:
-            logger.error("GENAI_SERVICE_URL environment variable is missing!")
-            return jsonify({"advice": "System Error: AI Service URL not configured."})
+        # 3. Deduplicate: an explicit Idempotency-Key replays for IDEMPOTENCY_TTL,
+        # otherwise identical (user, query) pairs are coalesced for DEDUP_WINDOW.
+        request_hash = fingerprint(str(user_query))
+        idem_key = request.headers.get('Idempotency-Key')
+        if idem_key:
+            key, ttl = f"{u_id}:key:{idem_key}", IDEMPOTENCY_TTL
+        else:
+            key, ttl = f"{u_id}:query:{request_hash}", DEDUP_WINDOW
 
-        # Ensure no trailing slash issues
-        genai_url = genai_url.rstrip('/') 
+        def generate_and_record():
+            # Only the request that actually calls the AI service takes a chat slot, so
+            # duplicates joining or replaying it never crowd out other users' requests.
+            if not chat_shedder.try_acquire():
+                raise Overloaded()
+            try:
+                advice, ok = ask_genai(user_query)
+                # 4. Save Interaction
+                db.session.add(Interaction(user_id=u_id, query=user_query, response=advice))
+                with timed("db_commit"):
+                    db.session.commit()
+            finally:
+                chat_shedder.release()
+            return {"advice": advice, "ok": ok}
 
-        # Call the AI
         try:
-            logger.info(f"Connecting to AI Service at: {genai_url}/generate")
+            result, replayed = deduplicator.run(key, request_hash, generate_and_record, ttl_seconds=ttl,
+                                                should_store=lambda r: r["ok"])
+        except IdempotencyConflict as e:
+            return jsonify({"error": str(e)}), 422
+        except TimeoutError as e:
+            # The original request is still running; a retry will join or replay it
+            return jsonify({"error": str(e)}), 504
+        except Overloaded:
+            logger.warning("Chat capacity saturated, shedding request")
+            metrics.RATE_LIMITED.labels(metrics.SERVICE, "load_shed").inc()
+            return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
+
+        metrics.record_cache("idempotency", replayed)
+        response = jsonify({"advice": result["advice"]})
+        if replayed:
+            response.headers['Idempotent-Replayed'] = 'true'
+        if not result["ok"]:
+            # Marks the canned "AI unavailable" answers so clients and load tests can tell them apart
+            response.headers['X-AI-Fallback'] = 'true'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Chat Route Error: {e}")
+        return jsonify({"error": "Session invalid or server error"}), 401
+
+def ask_genai(user_query):
+    """Calls the GenAI service. Returns (advice, ok) where ok is False for fallback messages."""
+    # Use the Environment Variable, NOT the hardcoded URL
+    genai_url = os.getenv('GENAI_SERVICE_URL')
+    
+    if not genai_url:
+        logger.error("GENAI_SERVICE_URL environment variable is missing!")
+        return "System Error: AI Service URL not configured.", False
+
+    # Ensure no trailing slash issues
+    genai_url = genai_url.rstrip('/') 
+
+    # Call the AI
+    try:
+        logger.info(f"Connecting to AI Service at: {genai_url}/generate - Correlation-ID: {metrics.correlation_id()}")
+        with timed("genai_call"):
             ai_res = requests.post(f"{genai_url}/generate", 
                                   json={"user_query": user_query, "task": "chat"}, 
+                                  headers=metrics.outbound_headers(),
                                   timeout=30)
-            
-            # Check if we got JSON back (or HTML error page)
-            try:
-                ai_data = ai_res.json()
-                advice = ai_data.get('advice', "No advice returned.")
-            except ValueError:
-                logger.error(f"AI Service returned non-JSON: {ai_res.text[:100]}")
-                advice = "Error: AI Service returned an invalid response."
-
-        except Exception as e:
-            logger.error(f"Failed to connect to AI Service: {e}")
-            advice = "I am currently unable to reach the AI engine. Please try again later."
-
-        # 4. Save Interaction
-        db.session.add(Interaction(user_id=u_id, query=user_query, response=advice))
-        db.session.commit()
-        
-        return jsonify({"advice": advice})
         
+        # Check if we got JSON back (or HTML error page)
+        try:
+            ai_data = ai_res.json()
+            return ai_data.get('advice', "No advice returned."), ai_res.ok
+        except ValueError:
+            logger.error(f"AI Service returned non-JSON: {ai_res.text[:100]}")
+            return "Error: AI Service returned an invalid response.", False
+
     except Exception as e:
-        logger.error(f"Chat Route Error: {e}")
-        return jsonify({"error": "Session invalid or server error"}), 401
+        logger.error(f"Failed to connect to AI Service: {e}")
+        return "I am currently unable to reach the AI engine. Please try again later.", False
 
 # --- Execution Entry Point ---
 if __name__ == '__main__':
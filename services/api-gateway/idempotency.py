@@ -0,0 +1,176 @@
+# services/api-gateway/idempotency.py
+#
+# Request deduplication for expensive gateway routes. A repeated idempotency key
+# either joins the request already in flight or replays its stored result, so a
+# double-click or client retry does not pay for a second RAG + LLM round trip.
+# Concurrent duplicates in the same process wait on a shared event; duplicates
+# on other gateway replicas see a Redis lock and poll for the stored result.
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with a different request body."""
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self, request_hash: str):
+        self.request_hash = request_hash
+        self.event = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class Deduplicator:
+    """Coalesces identical requests and stores their results briefly in Redis."""
+
+    def __init__(self, redis_url: Optional[str] = None, wait_timeout: float = 35.0, poll_interval: float = 0.1,
+                 retry_interval: float = 5.0):
+        self.redis_url = redis_url or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._redis_down_until = 0.0
+        self.flights: Dict[str, _Flight] = {}
+        self.lock = threading.Lock()
+        try:
+            self.client = redis.Redis.from_url(self.redis_url, decode_responses=True,
+                                               socket_connect_timeout=0.5, socket_timeout=0.5)
+        except Exception as e:
+            logger.error(f"Deduplicator could not configure Redis at {self.redis_url}: {e}")
+            self.client = None
+
+    # --- Redis helpers (all best effort; local coalescing still works without Redis) ---
+    def _redis_available(self) -> bool:
+        return self.client is not None and time.monotonic() >= self._redis_down_until
+
+    def _mark_down(self, e: Exception) -> None:
+        logger.warning(f"Idempotency store unavailable, coalescing locally only: {e}")
+        self._redis_down_until = time.monotonic() + self.retry_interval
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self._redis_available():
+            return None
+        try:
+            data = self.client.get(f"idem:result:{key}")
+            return json.loads(data) if data else None
+        except redis.RedisError as e:
+            self._mark_down(e)
+            return None
+
+    def _store(self, key: str, request_hash: str, result: Dict[str, Any], ttl_seconds: int) -> None:
+        if not self._redis_available():
+            return
+        try:
+            record = json.dumps({"request_hash": request_hash, "result": result})
+            pipe = self.client.pipeline()
+            pipe.setex(f"idem:result:{key}", ttl_seconds, record)
+            pipe.delete(f"idem:lock:{key}")
+            pipe.execute()
+        except redis.RedisError as e:
+            self._mark_down(e)
+
+    def _try_lock(self, key: str) -> bool:
+        """Claims the key across replicas. Returns True if Redis is unavailable."""
+        if not self._redis_available():
+            return True
+        try:
+            return bool(self.client.set(f"idem:lock:{key}", "1", nx=True, ex=int(self.wait_timeout)))
+        except redis.RedisError as e:
+            self._mark_down(e)
+            return True
+
+    def _unlock(self, key: str) -> None:
+        if not self._redis_available():
+            return
+        try:
+            self.client.delete(f"idem:lock:{key}")
+        except redis.RedisError:
+            pass
+
+    def _await_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        """Polls for a result produced by another replica. None if it never lands."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            record = self._load(key)
+            if record:
+                return record
+            try:
+                if not self.client.exists(f"idem:lock:{key}"):
+                    return None
+            except redis.RedisError:
+                return None
+            time.sleep(self.poll_interval)
+        return None
+
+    @staticmethod
+    def _check(record: Dict[str, Any], request_hash: str) -> Dict[str, Any]:
+        if record["request_hash"] != request_hash:
+            raise IdempotencyConflict("Idempotency key reused with a different request")
+        return record["result"]
+
+    def run(self, key: str, request_hash: str, fn: Callable[[], Dict[str, Any]], ttl_seconds: int = 300,
+            should_store: Callable[[Dict[str, Any]], bool] = lambda result: True) -> Tuple[Dict[str, Any], bool]:
+        """
+        Runs `fn` at most once per key within the TTL. Concurrent duplicates always
+        share the result; it is only kept for later replays if `should_store` agrees.
+
+        Returns:
+            (result, replayed): replayed is True when the result came from an
+            earlier or concurrent execution rather than this call.
+        """
+        record = self._load(key)
+        if record:
+            return self._check(record, request_hash), True
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight(request_hash)
+
+        if not leader:
+            if flight.request_hash != request_hash:
+                raise IdempotencyConflict("Idempotency key reused with a different request")
+            if not flight.event.wait(self.wait_timeout):
+                raise TimeoutError("Timed out waiting for in-flight duplicate request")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            if not self._try_lock(key):
+                record = self._await_remote(key)
+                if record:
+                    flight.result = self._check(record, request_hash)
+                    return flight.result, True
+            try:
+                flight.result = fn()
+            except BaseException:
+                self._unlock(key)
+                raise
+            if should_store(flight.result):
+                self._store(key, request_hash, flight.result, ttl_seconds)
+            else:
+                self._unlock(key)
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.event.set()
@@ -0,0 +1,185 @@
+# services/api-gateway/rate_limiter.py
+#
+# Per-user / per-route rate limiting and global load shedding for the gateway.
+# Token buckets live in Redis so every gateway replica shares the same budget;
+# each check is a single atomic Lua script. If Redis is unreachable the limiter
+# degrades to an in-process bucket instead of failing open or blocking requests.
+
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+import redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = bucket key
+# ARGV[1] = capacity, ARGV[2] = refill rate (tokens/sec), ARGV[3] = tokens requested
+# Uses the Redis server clock so replicas with skewed clocks agree.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_limit(spec: str) -> Tuple[int, float]:
+    """Parses a 'capacity/period_seconds' spec (e.g. '10/60') into (capacity, refill rate)."""
+    capacity, period = spec.split('/', 1)
+    capacity, period = int(capacity), float(period)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit spec: {spec}")
+    return capacity, capacity / period
+
+
+# Route limits keyed by Flask endpoint name. Override with RATE_LIMIT_<ENDPOINT>.
+# Anonymous requests are limited per client IP; behind a proxy, set
+# TRUSTED_PROXY_HOPS (app.py) or they all share the proxy's bucket.
+DEFAULT_LIMITS = {
+    "chat": "10/60",
+    "login": "5/60",
+    "register": "3/60",
+    "default": "60/60",
+}
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_seconds: float, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_seconds = reset_seconds
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        """Standard rate-limit response headers."""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_seconds)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class LocalTokenBucket:
+    """In-process token buckets, used when Redis is unavailable."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.buckets: Dict[str, list] = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, rate: float, requested: int = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self.buckets[key] = [float(capacity), now, capacity, rate]
+            tokens = min(capacity, bucket[0] + max(0.0, now - bucket[1]) * rate)
+            allowed = tokens >= requested
+            if allowed:
+                tokens -= requested
+            bucket[0], bucket[1] = tokens, now
+            return allowed, tokens
+
+    def _prune(self, now: float) -> None:
+        """Drops buckets that have refilled completely (they carry no state)."""
+        full = [k for k, (tokens, ts, cap, rate) in self.buckets.items()
+                if tokens + (now - ts) * rate >= cap]
+        for k in full:
+            del self.buckets[k]
+        if len(self.buckets) >= self.max_keys:
+            self.buckets.clear()
+
+
+class RateLimiter:
+    """Redis-backed token bucket limiter with a local fallback."""
+
+    def __init__(self, redis_url: Optional[str] = None, retry_interval: float = 5.0):
+        self.redis_url = redis_url or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+        self.retry_interval = retry_interval
+        self.local = LocalTokenBucket()
+        self.limits = {
+            name: parse_limit(os.environ.get(f"RATE_LIMIT_{name.upper()}", spec))
+            for name, spec in DEFAULT_LIMITS.items()
+        }
+        self._redis_down_until = 0.0
+        try:
+            self.client = redis.Redis.from_url(self.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        except Exception as e:
+            logger.error(f"Rate limiter could not configure Redis at {self.redis_url}: {e}")
+            self.client = None
+            self.script = None
+
+    def limit_for(self, route: str) -> Tuple[int, float]:
+        return self.limits.get(route, self.limits["default"])
+
+    def check(self, identity: str, route: str, cost: int = 1) -> RateLimitResult:
+        """Consumes `cost` tokens from the (route, identity) bucket."""
+        capacity, rate = self.limit_for(route)
+        key = f"ratelimit:{route}:{identity}"
+
+        allowed, tokens = None, 0.0
+        if self.script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                res = self.script(keys=[key], args=[capacity, rate, cost])
+                allowed, tokens = bool(int(res[0])), float(res[1])
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter Redis unavailable, using local buckets: {e}")
+                self._redis_down_until = time.monotonic() + self.retry_interval
+        if allowed is None:
+            allowed, tokens = self.local.consume(key, capacity, rate, cost)
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=capacity,
+            remaining=int(tokens),
+            reset_seconds=(capacity - tokens) / rate,
+            retry_after=0.0 if allowed else (cost - tokens) / rate,
+        )
+
+
+class Overloaded(Exception):
+    """Raised when a load shedder has no free slot."""
+
+
+class LoadShedder:
+    """
+    Caps concurrent in-flight requests on expensive routes. Requests over the
+    cap are rejected immediately rather than queued behind a saturated LLM.
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None):
+        self.max_in_flight = max_in_flight or int(os.environ.get("MAX_CONCURRENT_CHAT", 32))
+        self.semaphore = threading.BoundedSemaphore(self.max_in_flight)
+
+    def try_acquire(self) -> bool:
+        return self.semaphore.acquire(blocking=False)
+
+    def release(self) -> None:
+        self.semaphore.release()
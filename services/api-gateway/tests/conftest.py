@@ -0,0 +1,66 @@
+# services/api-gateway/tests/conftest.py
+#
+# Tests import the gateway's modules the same way `python app.py` does, with a
+# throwaway SQLite database and fakeredis in place of Redis, so the suite runs
+# without Postgres, Redis or the GenAI service.
+
+import os
+import sys
+import tempfile
+import fakeredis
+import jwt
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'gateway-test.db')}"
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"  # never dialled; tests swap in fakeredis
+os.environ["GENAI_SERVICE_URL"] = "http://genai.invalid"
+os.environ["SECRET_KEY"] = "gateway-test-secret-0123456789abcdef"
+
+from rate_limiter import LoadShedder, RateLimiter, TOKEN_BUCKET_SCRIPT  # noqa: E402
+from idempotency import Deduplicator  # noqa: E402
+
+
+@pytest.fixture
+def redis_server():
+    """One in-memory Redis; every client created from it sees the same data, like separate replicas."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def limiter(redis_server):
+    limiter = RateLimiter()
+    limiter.client = fakeredis.FakeRedis(server=redis_server)
+    limiter.script = limiter.client.register_script(TOKEN_BUCKET_SCRIPT)
+    return limiter
+
+
+@pytest.fixture
+def make_deduplicator(redis_server):
+    def make(**kwargs) -> Deduplicator:
+        dedup = Deduplicator(**kwargs)
+        dedup.client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+        return dedup
+    return make
+
+
+@pytest.fixture
+def gateway(monkeypatch, limiter, make_deduplicator):
+    """The gateway app module with Redis-backed components on fakeredis and an empty database."""
+    import app as gateway_app
+    monkeypatch.setattr(gateway_app, "rate_limiter", limiter)
+    monkeypatch.setattr(gateway_app, "deduplicator", make_deduplicator(wait_timeout=5))
+    monkeypatch.setattr(gateway_app, "chat_shedder", LoadShedder(4))
+    with gateway_app.app.app_context():
+        gateway_app.db.drop_all()
+        gateway_app.db.create_all()
+        gateway_app.db.session.add(gateway_app.User(id=1, username="alice", password="x"))
+        gateway_app.db.session.commit()
+    return gateway_app
+
+
+@pytest.fixture
+def auth(gateway):
+    token = jwt.encode({"u_id": 1}, gateway.app.config["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": token}
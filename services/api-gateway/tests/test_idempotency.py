@@ -0,0 +1,216 @@
+import threading
+import time
+import pytest
+
+from idempotency import IdempotencyConflict, fingerprint
+from rate_limiter import LoadShedder
+
+
+class SlowCall:
+    """Stand-in for an expensive upstream call that blocks until released."""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.result = result or {"advice": "buy", "ok": True}
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.entered.set()
+        assert self.release.wait(5)
+        return self.result
+
+
+def run_concurrently(target, n):
+    results = [None] * n
+
+    def worker(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def join(threads):
+    for t in threads:
+        t.join(5)
+
+
+def test_concurrent_duplicates_share_one_call(make_deduplicator):
+    dedup, call = make_deduplicator(), SlowCall()
+    threads, results = run_concurrently(lambda: dedup.run("k", "h", call), 5)
+    assert call.entered.wait(5)
+    time.sleep(0.1)  # let the duplicates join the flight
+    call.release.set()
+    join(threads)
+
+    assert call.calls == 1
+    assert all(result == call.result for result, _ in results)
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+
+def test_stored_result_is_replayed_by_other_replicas(make_deduplicator):
+    first, second = make_deduplicator(), make_deduplicator()
+    assert first.run("k", "h", lambda: {"n": 1}) == ({"n": 1}, False)
+    assert second.run("k", "h", lambda: pytest.fail("should replay")) == ({"n": 1}, True)
+
+
+def test_key_reused_with_different_request_conflicts(make_deduplicator):
+    dedup = make_deduplicator()
+    dedup.run("k", "h1", lambda: {"n": 1})
+    with pytest.raises(IdempotencyConflict):
+        dedup.run("k", "h2", lambda: {"n": 2})
+
+
+def test_in_flight_key_reused_with_different_request_conflicts(make_deduplicator):
+    dedup, call = make_deduplicator(), SlowCall()
+    threads, _ = run_concurrently(lambda: dedup.run("k", "h1", call), 1)
+    assert call.entered.wait(5)
+    with pytest.raises(IdempotencyConflict):
+        dedup.run("k", "h2", lambda: {"n": 2})
+    call.release.set()
+    join(threads)
+
+
+def test_unstored_results_are_not_replayed(make_deduplicator):
+    dedup, calls = make_deduplicator(), []
+
+    def fn():
+        calls.append(1)
+        return {"ok": False}
+
+    for _ in range(2):
+        assert dedup.run("k", "h", fn, should_store=lambda r: r["ok"]) == ({"ok": False}, False)
+    assert len(calls) == 2
+
+
+def test_follower_on_another_replica_polls_for_the_result(make_deduplicator):
+    leader, follower = make_deduplicator(), make_deduplicator(poll_interval=0.01)
+    call = SlowCall()
+    threads, _ = run_concurrently(lambda: leader.run("k", "h", call), 1)
+    assert call.entered.wait(5)
+    threads2, results = run_concurrently(lambda: follower.run("k", "h", lambda: pytest.fail("should wait")), 1)
+    time.sleep(0.05)
+    call.release.set()
+    join(threads + threads2)
+    assert results == [(call.result, True)]
+
+
+def test_leader_errors_reach_followers_and_release_the_key(make_deduplicator):
+    dedup, entered, release = make_deduplicator(), threading.Event(), threading.Event()
+
+    def failing():
+        entered.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def attempt():
+        try:
+            dedup.run("k", "h", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads, _ = run_concurrently(attempt, 3)
+    assert entered.wait(5)
+    time.sleep(0.1)
+    release.set()
+    join(threads)
+    assert len(errors) == 3
+    assert dedup.run("k", "h", lambda: {"n": 1}) == ({"n": 1}, False)
+
+
+def test_follower_times_out(make_deduplicator):
+    dedup, call = make_deduplicator(wait_timeout=0.1), SlowCall()
+    threads, _ = run_concurrently(lambda: dedup.run("k", "h", call), 1)
+    assert call.entered.wait(5)
+    with pytest.raises(TimeoutError):
+        dedup.run("k", "h", call)
+    call.release.set()
+    join(threads)
+
+
+def test_fingerprint_separates_parts():
+    assert fingerprint("ab", "c") != fingerprint("a", "bc")
+
+
+# --- Through the chat route ---
+def post_chat(gateway, auth, query, key=None):
+    headers = dict(auth, **({"Idempotency-Key": key} if key else {}))
+    return gateway.app.test_client().post("/api/v1/chat", json={"query": query}, headers=headers)
+
+
+def interaction_count(gateway):
+    with gateway.app.app_context():
+        return gateway.db.session.query(gateway.Interaction).count()
+
+
+def test_concurrent_duplicate_chats_call_genai_once(gateway, auth, monkeypatch):
+    genai = SlowCall(("Diversify.", True))
+    monkeypatch.setattr(gateway, "ask_genai", genai)
+    threads, responses = run_concurrently(lambda: post_chat(gateway, auth, "Should I buy TCS?"), 3)
+    assert genai.entered.wait(5)
+    time.sleep(0.1)
+    genai.release.set()
+    join(threads)
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert {r.get_json()["advice"] for r in responses} == {"Diversify."}
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 2
+    assert genai.calls == 1
+    assert interaction_count(gateway) == 1
+
+
+def test_reused_idempotency_key_with_another_query_is_422(gateway, auth, monkeypatch):
+    monkeypatch.setattr(gateway, "ask_genai", lambda q: ("Hold.", True))
+    assert post_chat(gateway, auth, "Buy TCS?", key="k1").status_code == 200
+    assert post_chat(gateway, auth, "Buy TCS?", key="k1").headers["Idempotent-Replayed"] == "true"
+    assert post_chat(gateway, auth, "Sell INFY?", key="k1").status_code == 422
+    assert interaction_count(gateway) == 1
+
+
+def test_fallback_answers_are_flagged_and_not_replayed(gateway, auth, monkeypatch):
+    calls = []
+    monkeypatch.setattr(gateway, "ask_genai", lambda q: calls.append(q) or ("AI unavailable.", False))
+    for _ in range(2):
+        res = post_chat(gateway, auth, "Buy TCS?")
+        assert res.status_code == 200
+        assert res.headers["X-AI-Fallback"] == "true"
+    assert len(calls) == 2
+
+
+def test_duplicates_do_not_hold_chat_slots(gateway, auth, monkeypatch):
+    monkeypatch.setattr(gateway, "chat_shedder", LoadShedder(1))
+    genai = SlowCall(("Diversify.", True))
+    monkeypatch.setattr(gateway, "ask_genai", genai)
+    threads, responses = run_concurrently(lambda: post_chat(gateway, auth, "Buy TCS?"), 1)
+    assert genai.entered.wait(5)
+
+    # Retries of the in-flight chat wait on it without taking the only slot...
+    followers, replies = run_concurrently(lambda: post_chat(gateway, auth, "Buy TCS?"), 3)
+    time.sleep(0.1)
+    assert gateway.chat_shedder.semaphore._value == 0
+    # ...while a genuinely new question is shed because the leader holds it
+    shed = post_chat(gateway, auth, "Sell INFY?")
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+
+    genai.release.set()
+    join(threads + followers)
+    assert [r.status_code for r in responses + replies] == [200] * 4
+    assert genai.calls == 1
+    assert gateway.chat_shedder.semaphore._value == 1
+
+
+def test_follower_timeout_is_504_not_401(gateway, auth, monkeypatch):
+    gateway.deduplicator.wait_timeout = 0.1
+    genai = SlowCall(("Diversify.", True))
+    monkeypatch.setattr(gateway, "ask_genai", genai)
+    threads, _ = run_concurrently(lambda: post_chat(gateway, auth, "Buy TCS?"), 1)
+    assert genai.entered.wait(5)
+    assert post_chat(gateway, auth, "Buy TCS?").status_code == 504
+    genai.release.set()
+    join(threads)
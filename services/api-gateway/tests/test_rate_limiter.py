@@ -0,0 +1,96 @@
+import time
+import fakeredis
+import pytest
+import redis
+
+from rate_limiter import LoadShedder, LocalTokenBucket, RateLimiter, TOKEN_BUCKET_SCRIPT, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit("10/60") == (10, 10 / 60)
+    for spec in ("0/60", "10/0", "ten/60", "10"):
+        with pytest.raises(ValueError):
+            parse_limit(spec)
+
+
+def test_limits_can_be_overridden_from_env(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_CHAT", "2/10")
+    limiter = RateLimiter()
+    assert limiter.limit_for("chat") == (2, 0.2)
+    assert limiter.limit_for("unknown_endpoint") == limiter.limits["default"]
+
+
+def test_local_bucket_denies_then_refills():
+    bucket = LocalTokenBucket()
+    assert [bucket.consume("k", 2, 40.0)[0] for _ in range(3)] == [True, True, False]
+    time.sleep(0.05)  # 40 tokens/s refills at least one token
+    assert bucket.consume("k", 2, 40.0)[0]
+
+
+def test_local_bucket_prunes_full_buckets():
+    bucket = LocalTokenBucket(max_keys=2)
+    bucket.consume("idle", 5, 1000.0)
+    bucket.consume("busy", 5, 0.001, requested=5)
+    time.sleep(0.01)  # "idle" has refilled and carries no state
+    bucket.consume("new", 5, 1.0)
+    assert set(bucket.buckets) == {"busy", "new"}
+
+
+def test_redis_bucket_headers_and_exhaustion(limiter):
+    limiter.limits["login"] = parse_limit("3/60")
+    results = [limiter.check("ip:1.2.3.4", "login") for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.headers()["X-RateLimit-Remaining"] for r in results] == ["2", "1", "0", "0"]
+    assert results[-1].headers()["Retry-After"] == "20"
+    assert limiter.check("ip:5.6.7.8", "login").allowed  # other clients have their own bucket
+
+
+def test_replicas_share_the_redis_budget(limiter, redis_server):
+    other = RateLimiter()
+    other.client = fakeredis.FakeRedis(server=redis_server)
+    other.script = other.client.register_script(TOKEN_BUCKET_SCRIPT)
+    for lim in (limiter, other):
+        lim.limits["chat"] = parse_limit("2/60")
+
+    assert limiter.check("user:1", "chat").allowed
+    assert other.check("user:1", "chat").allowed
+    assert not limiter.check("user:1", "chat").allowed
+
+
+def test_falls_back_to_local_buckets_when_redis_fails(limiter):
+    def down(**kwargs):
+        raise redis.ConnectionError("down")
+
+    limiter.script = down
+    limiter.limits["login"] = parse_limit("1/60")
+    assert limiter.check("ip:1.2.3.4", "login").allowed
+    assert not limiter.check("ip:1.2.3.4", "login").allowed
+    assert limiter._redis_down_until > time.monotonic()
+
+
+def test_load_shedder_caps_concurrency():
+    shedder = LoadShedder(2)
+    assert shedder.try_acquire() and shedder.try_acquire()
+    assert not shedder.try_acquire()
+    shedder.release()
+    assert shedder.try_acquire()
+
+
+def test_gateway_returns_429_with_headers(gateway):
+    gateway.rate_limiter.limits["login"] = parse_limit("2/60")
+    client = gateway.app.test_client()
+    codes = [client.post("/api/v1/login", json={"username": "bob", "password": "pw"}) for _ in range(3)]
+    assert [r.status_code for r in codes] == [401, 401, 429]
+    assert codes[0].headers["X-RateLimit-Limit"] == "2"
+    assert codes[-1].headers["Retry-After"] == "30"
+
+
+def test_cors_preflight_is_not_limited(gateway):
+    gateway.rate_limiter.limits["chat"] = parse_limit("1/60")
+    client = gateway.app.test_client()
+    preflight = {"Origin": "http://localhost:5173", "Access-Control-Request-Method": "POST"}
+    for _ in range(3):
+        res = client.options("/api/v1/chat", headers=preflight)
+        assert res.status_code == 200
+        assert "X-RateLimit-Remaining" not in res.headers
+    assert gateway.chat_shedder.semaphore._value == 4
@@ -3,6 +3,8 @@ from flask import Flask, request, jsonify
 from groq import Groq
 from flask_cors import CORS
 from rag_system import SimpleRAG
+import metrics
+from metrics import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
 # Initialize Groq Client
 api_key = os.environ.get("GROQ_API_KEY")
@@ -27,7 +30,8 @@ def get_market_data(query):
         ticker = match.group(0)
         market_data_url = os.environ.get("MARKET_DATA_URL", "http://market-data-service:5000")
         try:
-            res = requests.get(f"{market_data_url}/data/{ticker}", timeout=5)
+            with timed("market_data_fetch"):
+                res = requests.get(f"{market_data_url}/data/{ticker}", headers=metrics.outbound_headers(), timeout=5)
             if res.status_code == 200:
                 data = res.json()
                 return f"\n[Live Market Data for {ticker}]: {data}\n"
@@ -35,6 +39,47 @@ def get_market_data(query):
             logger.error(f"Failed to fetch market data for {ticker}: {e}")
     return ""
 
+# Uppercase words that look like tickers but are financial acronyms
+NON_TICKERS = {"SIP", "SEBI", "RBI", "ETF", "NAV", "IPO", "EMI", "PPF", "NPS", "ELSS", "GDP", "INR", "USD", "CEO", "FD"}
+
+def extract_tickers(query):
+    tickers = re.findall(r'\b[A-Z][A-Z&]{1,9}\b', query or "")
+    return [t for t in dict.fromkeys(tickers) if t not in NON_TICKERS]
+
+def get_portfolio_context(symbols, weights=None, window="1y"):
+    """Fetches batch analytics for a basket of symbols and renders them as compact prompt context."""
+    market_data_url = os.environ.get("MARKET_DATA_URL", "http://market-data-service:5000")
+    try:
+        with timed("portfolio_analytics_fetch"):
+            res = requests.post(f"{market_data_url}/portfolio/analytics",
+                                json={"symbols": symbols, "weights": weights, "window": window},
+                                headers=metrics.outbound_headers(), timeout=10)
+        if res.status_code != 200:
+            return ""
+        data = res.json()
+    except Exception as e:
+        logger.error(f"Failed to fetch portfolio analytics for {symbols}: {e}")
+        return ""
+
+    p = data["portfolio"]
+    lines = [f"\n[Portfolio Analytics, {data['window']}, {data['observations']} trading days, beta vs {data['index']}]"]
+    for sym, w in zip(data["symbols"], data["weights"]):
+        a = data["assets"][sym]
+        lines.append(f"{sym} (weight {w:.0%}): return {a['annual_return']:.1%}, volatility {a['annual_volatility']:.1%}, "
+                     f"beta {a['beta']:.2f}, max drawdown {a['max_drawdown']:.1%}")
+    lines.append(f"Portfolio: return {p['annual_return']:.1%}, volatility {p['annual_volatility']:.1%}, beta {p['beta']:.2f}, "
+                 f"max drawdown {p['max_drawdown']:.1%}, 1-day VaR95 {p['var_95']:.2%}, CVaR95 {p['cvar_95']:.2%}")
+    corr = data["correlation"]
+    pairs = [(corr[i][j], data["symbols"][i], data["symbols"][j])
+             for i in range(len(corr)) for j in range(i + 1, len(corr))]
+    if pairs:
+        avg = sum(c for c, _, _ in pairs) / len(pairs)
+        top = max(pairs)
+        lines.append(f"Average pairwise correlation {avg:.2f}; most correlated {top[1]}/{top[2]} at {top[0]:.2f}")
+    if data.get("missing"):
+        lines.append(f"No data for: {', '.join(data['missing'])}")
+    return "\n".join(lines) + "\n"
+
 @app.route('/generate', methods=['POST'])
 def generate():
     # 1. Check if API Key exists
@@ -52,11 +97,19 @@ def generate():
         
         # 2. Construct Prompt using Agentic RAG
         # Retrieve context from local documents
-        rag_docs = rag_system.retrieve_context(user_query)
+        with timed("rag_retrieval"):
+            rag_docs = rag_system.retrieve_context(user_query)
         context_str = "\n".join(rag_docs) if rag_docs else "No specific local context available."
         
-        # Fetch live market data if applicable
-        market_context = get_market_data(user_query)
+        # Fetch live market data if applicable. Plans over several symbols get one
+        # batched portfolio analytics call instead of per-symbol quotes.
+        market_context = ""
+        if task == 'plan':
+            symbols = data.get('symbols') or extract_tickers(user_query)
+            if len(symbols) >= 2:
+                market_context = get_portfolio_context(symbols, data.get('weights'))
+        if not market_context:
+            market_context = get_market_data(user_query)
         
         if task == 'plan':
             system_msg = f"You are a Wealth Manager. Provide a structured investment plan.\n\nContext:\n{context_str}{market_context}"
@@ -65,18 +118,22 @@ def generate():
             system_msg = f"You are a Financial Analyst. Be concise and helpful.\n\nContext:\n{context_str}{market_context}"
             model = "llama-3.3-70b-versatile"
 
-        logger.info(f"Generating for query: {user_query}")
+        logger.info(f"Generating for query: {user_query} - Correlation-ID: {metrics.correlation_id()}")
 
         # 3. Call Groq
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_query}
-            ],
-            model=model,
-            temperature=0.2,
-            max_tokens=500,
-        )
+        with timed("llm_call"):
+            chat_completion = client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": user_query}
+                ],
+                model=model,
+                temperature=0.2,
+                max_tokens=500,
+            )
+        if chat_completion.usage:
+            metrics.LLM_TOKENS.labels(metrics.SERVICE, model, "in").inc(chat_completion.usage.prompt_tokens)
+            metrics.LLM_TOKENS.labels(metrics.SERVICE, model, "out").inc(chat_completion.usage.completion_tokens)
         
         result = chat_completion.choices[0].message.content
         return jsonify({"advice": result})
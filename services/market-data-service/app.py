@@ -4,17 +4,23 @@
 # It exposes an API endpoint to retrieve stock data, leveraging the
 # `data_fetcher` module to interact with yfinance.
 
-from flask import Flask, jsonify
-from data_fetcher import fetch_stock_data # Import the data fetching logic
+from flask import Flask, jsonify, request
+from data_fetcher import fetch_stock_data, fetch_bars # Import the data fetching logic
+from portfolio import portfolio_analytics, WINDOWS, DEFAULT_INDEX
 from cache import RedisCache
+import metrics
+from metrics import timed
 import logging # For logging application events and errors
 import os
+import re
+import math
 
 # Configure logging for the application
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Initialize the Flask application
 app = Flask(__name__)
+metrics.init_app(app)
 
 # Initialize Redis Cache
 cache = RedisCache()
@@ -29,38 +35,58 @@ def health_check():
     logging.info("Market Data Service health check requested.")
     return jsonify({"status": "Market Data Service is healthy"}), 200
 
+# Intervals and periods accepted by yfinance
+VALID_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"}
+PERIOD_PATTERN = re.compile(r"^(\d+(d|wk|mo|y)|ytd|max)$")
+
 # --- API Endpoint for Stock Data ---
 @app.route('/data/<symbol>', methods=['GET'])
 def get_data(symbol):
     """
-    API endpoint to retrieve the latest stock data for a given symbol.
-    It calls the `fetch_stock_data` function and returns the data as JSON.
+    API endpoint to retrieve stock data for a given symbol.
+    Without query parameters it returns the latest 1-minute quote (via `fetch_stock_data`).
+    With `interval` and/or `period` (e.g. ?interval=15m&period=5d) it returns the OHLCV
+    bar series (via `fetch_bars`); intraday intervals are resampled from 1-minute bars.
 
     Args:
         symbol (str): The stock ticker symbol provided in the URL path.
 
     Returns:
         JSON response: Contains the stock data on success (HTTP 200).
-        JSON error: Contains an error message on failure (HTTP 404 or 500).
+        JSON error: Contains an error message on failure (HTTP 400, 404 or 500).
     """
-    logging.info(f"Received request for market data for symbol: {symbol}")
+    logging.info(f"Received request for market data for symbol: {symbol} - Correlation-ID: {metrics.correlation_id()}")
+
+    interval = request.args.get('interval')
+    period = request.args.get('period')
+    want_bars = interval is not None or period is not None
+    interval, period = interval or "1m", period or "1d"
+    if interval not in VALID_INTERVALS:
+        return jsonify({"error": f"interval must be one of {', '.join(sorted(VALID_INTERVALS))}"}), 400
+    if not PERIOD_PATTERN.match(period):
+        return jsonify({"error": "period must look like 1d, 5d, 1mo, 1y, ytd or max"}), 400
     
     # 1. Check Cache
     cache_key = f"market_data:{symbol.upper()}"
-    cached_data = cache.get(cache_key)
+    if want_bars:
+        cache_key += f":{period}:{interval}"
+    with timed("redis_get"):
+        cached_data = cache.get(cache_key)
+    metrics.record_cache("redis", bool(cached_data))
     if cached_data:
         logging.info(f"Returning cached data for {symbol}.")
         return jsonify(cached_data), 200
         
     try:
-        # In a real system, 'period' and 'interval' might be query parameters
-        # or defaults based on the type of data required (e.g., tick, 1min, daily).
-        # For this prototype, we fetch 1-minute data for the current day.
-        stock_data = fetch_stock_data(symbol.upper(), period="1d", interval="1m")
+        if want_bars:
+            stock_data = fetch_bars(symbol.upper(), period=period, interval=interval)
+        else:
+            stock_data = fetch_stock_data(symbol.upper(), period=period, interval=interval)
         logging.info(f"Successfully fetched data for {symbol}.")
         
         # 2. Save to Cache (TTL 60s)
-        cache.set(cache_key, stock_data, ttl_seconds=60)
+        with timed("redis_set"):
+            cache.set(cache_key, stock_data, ttl_seconds=60)
         
         return jsonify(stock_data), 200
     except ValueError as e:
@@ -72,6 +98,59 @@ def get_data(symbol):
         logging.error(f"Internal server error while fetching data for {symbol}: {e}")
         return jsonify({"error": "Internal server error while fetching market data"}), 500
 
+# --- API Endpoint for Portfolio Analytics ---
+@app.route('/portfolio/analytics', methods=['GET', 'POST'])
+def get_portfolio_analytics():
+    """
+    API endpoint computing risk/return analytics for a weighted basket of symbols.
+    Accepts a JSON body ({"symbols": [...], "weights": [...], "window": "1y", "index": "^NSEI"})
+    or the same fields as query parameters (comma-separated lists).
+
+    Returns:
+        JSON response: Per-asset and portfolio returns, volatility, beta, drawdown,
+                       historical VaR, and covariance/correlation matrices (HTTP 200).
+        JSON error: Invalid input (HTTP 400), no data (HTTP 404) or failure (HTTP 500).
+    """
+    body = request.get_json(silent=True) or {}
+    symbols = body.get('symbols', request.args.get('symbols', ''))
+    weights = body.get('weights', request.args.get('weights'))
+    window = body.get('window', request.args.get('window', '1y'))
+    index_symbol = body.get('index', request.args.get('index', DEFAULT_INDEX))
+
+    try:
+        if isinstance(symbols, str):
+            symbols = symbols.split(',')
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        if isinstance(weights, str):
+            weights = weights.split(',')
+        weights = [float(w) for w in weights] if weights else None
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({"error": "symbols must be a list of tickers and weights a list of numbers"}), 400
+
+    if not symbols or len(symbols) > 50:
+        return jsonify({"error": "Provide between 1 and 50 symbols"}), 400
+    if weights is not None and len(weights) != len(symbols):
+        return jsonify({"error": "weights must have one entry per symbol"}), 400
+    if weights is not None and not all(math.isfinite(w) and w >= 0 for w in weights):
+        return jsonify({"error": "weights must be finite, non-negative numbers (long-only)"}), 400
+    if weights is not None and sum(weights) <= 0:
+        return jsonify({"error": "weights must sum to a positive number"}), 400
+    if window not in WINDOWS:
+        return jsonify({"error": f"window must be one of {', '.join(WINDOWS)}"}), 400
+    if not isinstance(index_symbol, str) or not index_symbol.strip():
+        return jsonify({"error": "index must be a ticker symbol"}), 400
+    index_symbol = index_symbol.strip().upper()
+
+    logging.info(f"Received portfolio analytics request for {symbols} (window={window}) - Correlation-ID: {metrics.correlation_id()}")
+    try:
+        return jsonify(portfolio_analytics(symbols, weights, window, index_symbol)), 200
+    except ValueError as e:
+        logging.warning(f"Portfolio analytics unavailable for {symbols}: {e}")
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logging.error(f"Internal server error while computing portfolio analytics for {symbols}: {e}")
+        return jsonify({"error": "Internal server error while computing portfolio analytics"}), 500
+
 # --- Application Entry Point ---
 
 if __name__ == '__main__':
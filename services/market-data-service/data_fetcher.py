@@ -6,22 +6,265 @@
 # this would involve direct, licensed data feeds from exchanges for ultra-low latency.
 
 import yfinance as yf
-import datetime
+import re
+import time
 import logging
+import threading
+import collections
+import numpy as np
+import pandas as pd
+import metrics
 
 # Configure logging for the module
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# A very simple in-memory cache for demonstration purposes.
-# In a production system, this would be a distributed, high-performance cache
-# like Redis (e.g., Google Cloud Memorystore for Redis).
-_market_data_cache = {}
+# Intraday intervals that can be rebuilt from 1-minute bars, in seconds.
+RESAMPLE_INTERVALS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800,
+                      "60m": 3600, "90m": 5400, "1h": 3600}
+MAX_BUFFER_DAYS = 7           # yfinance serves at most 7 days of 1-minute bars per request
+SESSION_OPEN_SECONDS = 33300  # 09:15 local; NSE intraday bars are aligned to the open
+BUFFER_CAPACITY = 3000        # ~7 sessions of 375 one-minute bars, plus slack
+BUFFER_TTL_SECONDS = 60
+MAX_BUFFERED_SYMBOLS = 200    # ~150 KB per full buffer; least recently used are evicted
+
+
+def _epoch_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """UTC epoch seconds for a (possibly naive) DatetimeIndex, independent of its resolution."""
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    return index.tz_convert("UTC").tz_localize(None).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+
+class BarBuffer:
+    """
+    Rolling, array-backed store of 1-minute OHLCV bars for one symbol. Every
+    intraday interval is resampled from these bars, so one upstream fetch per
+    symbol answers all of them. Timestamps are UTC epoch seconds.
+    """
+
+    def __init__(self, capacity: int = BUFFER_CAPACITY):
+        self.capacity = capacity
+        self.ts = np.empty(0, dtype=np.int64)
+        self.open = np.empty(0)
+        self.high = np.empty(0)
+        self.low = np.empty(0)
+        self.close = np.empty(0)
+        self.volume = np.empty(0, dtype=np.int64)
+        self.tz = None
+        self.utc_offset = 0  # seconds; NSE (IST) has no DST
+        self.covered_days = 0
+        self.fetched_at = 0.0
+        self.lock = threading.Lock()
+
+    def is_fresh(self, days: int) -> bool:
+        return (self.covered_days >= days and len(self.ts) > 0
+                and time.monotonic() - self.fetched_at < BUFFER_TTL_SECONDS)
+
+    def merge(self, hist: pd.DataFrame, days: int, replace: bool = False) -> None:
+        """
+        Merges freshly fetched bars (newer values win) and trims to capacity.
+        With `replace`, previously buffered bars are dropped first.
+        """
+        if replace:
+            self.ts, self.open, self.high, self.low, self.close, self.volume = (
+                c[:0] for c in (self.ts, self.open, self.high, self.low, self.close, self.volume))
+            self.covered_days = 0
+        index = hist.index
+        if index.tz is not None:
+            self.tz = str(index.tz)
+            self.utc_offset = int(index[-1].utcoffset().total_seconds())
+        ts = _epoch_seconds(index)
+
+        ts = np.concatenate([self.ts, ts])
+        cols = [np.concatenate([old, hist[name].to_numpy(dtype=old.dtype)])
+                for old, name in ((self.open, "Open"), (self.high, "High"), (self.low, "Low"),
+                                  (self.close, "Close"), (self.volume, "Volume"))]
+        # Keep the last occurrence of each timestamp, in time order
+        _, rev_idx = np.unique(ts[::-1], return_index=True)
+        keep = (len(ts) - 1 - rev_idx)[-self.capacity:]
+        self.ts = ts[keep]
+        self.open, self.high, self.low, self.close, self.volume = (c[keep] for c in cols)
+        self.covered_days = max(self.covered_days, days)
+        self.fetched_at = time.monotonic()
+
+    def sessions_since_last_bar(self) -> int:
+        """Weekday sessions from the newest buffered bar's session through today, inclusive."""
+        last = np.datetime64(int((self.ts[-1] + self.utc_offset) // 86400), "D")
+        today = np.datetime64(int((time.time() + self.utc_offset) // 86400), "D")
+        return int(np.busday_count(last, today + 1))
+
+    def window(self, days: int) -> dict:
+        """Bars from the last `days` trading sessions in the buffer."""
+        session = (self.ts + self.utc_offset) // 86400
+        sessions = np.unique(session)
+        start = np.searchsorted(session, sessions[-min(days, len(sessions))]) if len(sessions) else 0
+        return {"ts": self.ts[start:], "open": self.open[start:], "high": self.high[start:],
+                "low": self.low[start:], "close": self.close[start:], "volume": self.volume[start:]}
+
+
+def resample_ohlcv(bars: dict, step: int, utc_offset: int = 0) -> dict:
+    """
+    Aggregates time-ordered bars into `step`-second buckets anchored at the daily
+    session open: open=first, high=max, low=min, close=last, volume=sum.
+    """
+    ts = bars["ts"]
+    if step == 60 or len(ts) == 0:
+        return bars
+    local = ts + utc_offset
+    anchor = (local // 86400) * 86400 + SESSION_OPEN_SECONDS
+    bucket = anchor + (local - anchor) // step * step - utc_offset
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return {
+        "ts": bucket[starts],
+        "open": bars["open"][starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+# Symbols come from user input, so buffers are only published (LRU-bounded)
+# once a fetch has filled them; until then concurrent first requests share a
+# pending buffer so they still make a single upstream call.
+_bar_buffers = collections.OrderedDict()
+_pending_buffers = {}
+_bar_buffers_lock = threading.Lock()
+
+
+def _buffer_for(full_symbol: str) -> BarBuffer:
+    with _bar_buffers_lock:
+        buffer = _bar_buffers.get(full_symbol)
+        if buffer is not None:
+            _bar_buffers.move_to_end(full_symbol)
+            return buffer
+        return _pending_buffers.setdefault(full_symbol, BarBuffer())
+
+
+def _settle(full_symbol: str, buffer: BarBuffer) -> None:
+    """After a fetch: publishes the buffer if it holds bars, evicting the least recently used."""
+    with _bar_buffers_lock:
+        if _pending_buffers.get(full_symbol) is buffer:
+            del _pending_buffers[full_symbol]
+        if len(buffer.ts):
+            _bar_buffers[full_symbol] = buffer
+            _bar_buffers.move_to_end(full_symbol)
+            while len(_bar_buffers) > MAX_BUFFERED_SYMBOLS:
+                _bar_buffers.popitem(last=False)
+
+
+def _period_days(period: str):
+    """Number of sessions for 'Nd' periods the buffer can serve, else None."""
+    match = re.fullmatch(r"(\d+)d", period)
+    if match and 1 <= int(match.group(1)) <= MAX_BUFFER_DAYS:
+        return int(match.group(1))
+    return None
+
+
+def _history(full_symbol: str, period: str, interval: str) -> pd.DataFrame:
+    logging.info(f"Fetching fresh data for {full_symbol} from yfinance (period={period}, interval={interval})...")
+    ticker = yf.Ticker(full_symbol)
+    with metrics.timed("yfinance_call"):
+        hist = ticker.history(period=period, interval=interval)
+    if hist.empty:
+        logging.warning(f"No data found for {full_symbol} with period={period}, interval={interval}.")
+    return hist
+
+
+def _buffered_bars(full_symbol: str, days: int, interval: str) -> tuple:
+    """Serves an intraday request from the symbol's 1-minute buffer, refreshing it if needed."""
+    buffer = _buffer_for(full_symbol)
+    # Holding the buffer lock while fetching lets concurrent requests share one upstream call
+    with buffer.lock:
+        if buffer.is_fresh(days):
+            logging.info(f"Serving {full_symbol} {interval} bars from the 1m buffer")
+            metrics.record_cache("memory", True)
+        else:
+            metrics.record_cache("memory", False)
+            fetch_days, replace = days, False
+            if buffer.covered_days >= days and len(buffer.ts):
+                # Top up from the newest buffered session; past a one-session gap
+                # the old bars can't be stitched on, so refetch the window instead
+                gap = buffer.sessions_since_last_bar()
+                fetch_days, replace = (max(gap, 1), False) if gap <= 2 else (days, True)
+            try:
+                hist = _history(full_symbol, f"{fetch_days}d", "1m")
+                if not hist.empty:
+                    buffer.merge(hist, days, replace)
+            finally:
+                _settle(full_symbol, buffer)
+            if not len(buffer.ts):
+                return None, None
+        bars = resample_ohlcv(buffer.window(days), RESAMPLE_INTERVALS[interval], buffer.utc_offset)
+        return bars, buffer.tz
+
+
+def _bar_arrays(symbol: str, period: str, interval: str) -> tuple:
+    """Returns (bars, tz): OHLCV arrays keyed by column plus the exchange timezone."""
+    full_symbol = f"{symbol.upper()}.NS" # Ensure symbol is uppercase and target NSE
+    days = _period_days(period)
+    try:
+        if days is not None and interval in RESAMPLE_INTERVALS:
+            bars, tz = _buffered_bars(full_symbol, days, interval)
+        else:
+            hist = _history(full_symbol, period, interval)
+            bars, tz = None, None
+            if not hist.empty:
+                tz = str(hist.index.tz) if hist.index.tz is not None else None
+                bars = {"ts": _epoch_seconds(hist.index), "open": hist["Open"].to_numpy(), "high": hist["High"].to_numpy(),
+                        "low": hist["Low"].to_numpy(), "close": hist["Close"].to_numpy(),
+                        "volume": hist["Volume"].to_numpy()}
+        if bars is None or len(bars["ts"]) == 0:
+            raise ValueError(f"No data found for {symbol}")
+    except Exception as e:
+        logging.error(f"Error fetching data for {full_symbol}: {e}")
+        # Re-raise the exception to be handled by the calling service (app.py)
+        raise
+    return bars, tz
+
+
+def _timestamps(ts: np.ndarray, tz) -> pd.DatetimeIndex:
+    timestamps = pd.to_datetime(ts, unit="s", utc=True)
+    return timestamps.tz_convert(tz) if tz else timestamps
+
+
+def fetch_bars(symbol: str, period: str = "1d", interval: str = "1m") -> dict:
+    """
+    Fetches OHLCV bars for the given symbol at the requested interval.
+    Intraday intervals over periods of up to 7 days are resampled from a
+    per-symbol 1-minute buffer; other combinations go straight to yfinance.
+
+    Args:
+        symbol (str): The stock ticker symbol (e.g., "RELIANCE", "TCS").
+        period (str): The period of data to fetch (e.g., "1d", "5d", "1mo").
+        interval (str): The interval of data points (e.g., "1m", "5m", "1h", "1d").
+
+    Returns:
+        dict: {"symbol", "period", "interval", "bars": [{timestamp, open, high, low, close, volume}, ...]}
+
+    Raises:
+        ValueError: If no data is found for the specified symbol.
+    """
+    bars, tz = _bar_arrays(symbol, period, interval)
+    return {
+        "symbol": symbol,
+        "period": period,
+        "interval": interval,
+        "bars": [
+            {"timestamp": t.isoformat(), "open": float(o), "high": float(h), "low": float(l),
+             "close": float(c), "volume": int(v)}
+            for t, o, h, l, c, v in zip(_timestamps(bars["ts"], tz), bars["open"], bars["high"],
+                                         bars["low"], bars["close"], bars["volume"])
+        ],
+    }
+
 
 def fetch_stock_data(symbol: str, period: str = "1d", interval: str = "1m") -> dict:
     """
     Fetches historical stock data for the given symbol from yfinance.
     Appends '.NS' for NSE-listed stocks to target the Indian market.
-    Includes a simple in-memory cache to reduce redundant API calls during rapid testing.
+    Intraday data is served from the per-symbol 1-minute buffer (see `fetch_bars`).
 
     Args:
         symbol (str): The stock ticker symbol (e.g., "RELIANCE", "TCS").
@@ -32,51 +275,22 @@ def fetch_stock_data(symbol: str, period: str = "1d", interval: str = "1m") -> d
 
     Returns:
         dict: A dictionary containing the latest stock data (close, high, low, volume, timestamp).
-              Returns an empty dictionary or raises an error if no data is found.
 
     Raises:
         ValueError: If no data is found for the specified symbol.
         Exception: For other unexpected errors during data fetching.
     """
-    full_symbol = f"{symbol.upper()}.NS" # Ensure symbol is uppercase and target NSE
-    
-    # Simple cache check: If data for this symbol is in cache and is recent enough (e.g., < 60 seconds)
-    if full_symbol in _market_data_cache:
-        cached_data = _market_data_cache[full_symbol]
-        if (datetime.datetime.now() - cached_data['timestamp']).total_seconds() < 60:
-            logging.info(f"Returning cached data for {full_symbol}")
-            return cached_data['data']
-
-    logging.info(f"Fetching fresh data for {full_symbol} from yfinance (period={period}, interval={interval})...")
-    try:
-        ticker = yf.Ticker(full_symbol)
-        # Fetch the most recent data for the last 'period' with 'interval'
-        hist = ticker.history(period=period, interval=interval)
-
-        if hist.empty:
-            logging.warning(f"No data found for {full_symbol} with period={period}, interval={interval}.")
-            raise ValueError(f"No data found for {symbol}")
-
-        # Get the latest data point from the historical data
-        latest = hist.iloc[-1]
-
-        data = {
-            "symbol": symbol,
-            "latest_close": float(latest["Close"]),
-            "high": float(latest["High"]),
-            "low": float(latest["Low"]),
-            "open": float(latest["Open"]),
-            "volume": int(latest["Volume"]),
-            "timestamp": latest.name.isoformat() # Timestamp of the data point
-        }
-        
-        # Update the in-memory cache with the fresh data and current timestamp
-        _market_data_cache[full_symbol] = {'data': data, 'timestamp': datetime.datetime.now()}
-        return data
-    except Exception as e:
-        logging.error(f"Error fetching data for {full_symbol}: {e}")
-        # Re-raise the exception to be handled by the calling service (app.py)
-        raise
+    # Only the last bar is needed, so read it from the arrays rather than formatting them all
+    bars, tz = _bar_arrays(symbol, period, interval)
+    return {
+        "symbol": symbol,
+        "latest_close": float(bars["close"][-1]),
+        "high": float(bars["high"][-1]),
+        "low": float(bars["low"][-1]),
+        "open": float(bars["open"][-1]),
+        "volume": int(bars["volume"][-1]),
+        "timestamp": _timestamps(bars["ts"][-1:], tz)[0].isoformat() # Timestamp of the data point
+    }
 
 # Example usage (for testing data_fetcher directly)
 if __name__ == '__main__':
@@ -94,6 +308,10 @@ if __name__ == '__main__':
         reliance_data_cached = fetch_stock_data("RELIANCE", period="1d", interval="1m")
         print("\nRELIANCE Data (cached):\n", reliance_data_cached)
 
+        # Coarser intervals are resampled from the same 1-minute buffer (no new upstream call)
+        reliance_15m = fetch_bars("RELIANCE", period="1d", interval="15m")
+        print(f"\nRELIANCE 15m bars: {len(reliance_15m['bars'])}, latest: {reliance_15m['bars'][-1]}")
+
         # Test for a non-existent symbol
         try:
             fetch_stock_data("NONEXISTENTSTOCK")
@@ -0,0 +1,135 @@
+# services/market-data-service/metrics.py
+#
+# Prometheus metrics, cache hit/miss counters, correlation IDs and the opt-in
+# sampling profiler for the Market Data Service.
+
+import os
+import sys
+import math
+import time
+import uuid
+import threading
+import collections
+from contextlib import contextmanager
+from flask import Flask, Response, abort, g, request
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+SERVICE = "market-data-service"
+
+# From sub-millisecond buffer and Redis hits up to multi-second yfinance downloads.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "finsense_http_request_duration_seconds", "HTTP request latency",
+    ["service", "endpoint", "method", "status"], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge(
+    "finsense_http_requests_in_flight", "HTTP requests currently being served", ["service"])
+STAGE_LATENCY = Histogram(
+    "finsense_stage_duration_seconds", "Latency of individual processing stages",
+    ["service", "stage"], buckets=LATENCY_BUCKETS)
+CACHE_REQUESTS = Counter(
+    "finsense_cache_requests_total", "Cache lookups by outcome (hit/miss)", ["service", "cache", "result"])
+
+CORRELATION_HEADER = "X-Correlation-ID"
+
+
+@contextmanager
+def timed(stage: str):
+    """Records the duration of the wrapped block under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(SERVICE, stage).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(SERVICE, cache, "hit" if hit else "miss").inc()
+
+
+def correlation_id() -> str:
+    return g.get("correlation_id") or str(uuid.uuid4())
+
+
+def outbound_headers() -> dict:
+    """Headers to attach to downstream service calls."""
+    return {CORRELATION_HEADER: correlation_id()}
+
+
+def sample_stacks(seconds: float, interval: float) -> collections.Counter:
+    """
+    Samples every thread's Python stack for `seconds`, returning folded-stack
+    counts (the input format of flamegraph.pl / speedscope).
+    """
+    counts = collections.Counter()
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def init_app(app: Flask) -> None:
+    """
+    Registers request timing, correlation IDs (taken from the caller's header
+    when present) and the opt-in /metrics and /debug/profile endpoints.
+    """
+
+    @app.before_request
+    def _start_request():
+        g.correlation_id = request.headers.get(CORRELATION_HEADER) or str(uuid.uuid4())
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.labels(SERVICE).inc()
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            REQUEST_LATENCY.labels(SERVICE, request.endpoint or "unmatched", request.method,
+                                   response.status_code).observe(time.perf_counter() - start)
+        response.headers[CORRELATION_HEADER] = correlation_id()
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        if g.pop("metrics_start", None) is not None:
+            IN_FLIGHT.labels(SERVICE).dec()
+
+    # Opt-in: metrics reveal traffic, error rates and which symbols are requested.
+    # METRICS_ALLOWED_IPS restricts scrapes to the collector.
+    if _env_flag("METRICS_ENABLED"):
+        allowed_ips = {ip.strip() for ip in os.environ.get("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()}
+
+        @app.route("/metrics", methods=["GET"])
+        def metrics():
+            if allowed_ips and request.remote_addr not in allowed_ips:
+                abort(404)
+            return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+    # Opt-in: stack sampling is cheap but exposes code internals.
+    if _env_flag("PROFILER_ENABLED"):
+        @app.route("/debug/profile", methods=["GET"])
+        def profile():
+            try:
+                seconds = float(request.args.get("seconds", 5))
+                interval_ms = float(request.args.get("interval_ms", 5))
+            except ValueError:
+                seconds = interval_ms = math.nan
+            if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+                return Response("seconds and interval_ms must be numbers\n", status=400, mimetype="text/plain")
+            # Below 1ms the sampler would spin a worker thread while holding the GIL
+            counts = sample_stacks(min(max(seconds, 0.0), 60.0), max(interval_ms, 1.0) / 1000)
+            body = "\n".join(f"{stack} {n}" for stack, n in counts.most_common())
+            return Response(body, mimetype="text/plain")
@@ -0,0 +1,181 @@
+# services/market-data-service/portfolio.py
+#
+# Portfolio analytics over many symbols. Daily closes for every symbol (plus
+# the benchmark index) are fetched from yfinance in a single batch, aligned
+# into a time x symbols matrix, and every statistic is computed with
+# vectorized NumPy operations over that matrix rather than per symbol.
+
+import logging
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import metrics
+from cache import RedisCache
+
+TRADING_DAYS = 252
+DEFAULT_INDEX = "^NSEI"  # NIFTY 50
+WINDOWS = ("1mo", "3mo", "6mo", "1y", "2y", "5y")
+RETURNS_TTL_SECONDS = 300
+
+
+def _yahoo_symbol(symbol: str) -> str:
+    """NSE equities take the '.NS' suffix; indices ('^NSEI') and suffixed symbols are used as-is."""
+    return symbol if symbol.startswith("^") or "." in symbol else f"{symbol}.NS"
+
+
+def fetch_aligned_closes(symbols: list, window: str) -> pd.DataFrame:
+    """
+    Downloads daily closes for all symbols in one upstream call and aligns them
+    on common dates. Columns are the caller's symbols, in the given order.
+    Symbols with no data are dropped.
+    """
+    yahoo = [_yahoo_symbol(s) for s in symbols]
+    logging.info(f"Fetching {len(yahoo)} symbols from yfinance in one batch (period={window}, interval=1d)...")
+    with metrics.timed("yfinance_call"):
+        raw = yf.download(yahoo, period=window, interval="1d", auto_adjust=True, progress=False, threads=True)
+    if raw is None or raw.empty:
+        raise ValueError("No price data found for the requested symbols")
+
+    closes = raw["Close"]
+    if isinstance(closes, pd.Series):  # single-ticker downloads come back flat
+        closes = closes.to_frame(yahoo[0])
+    closes = closes.reindex(columns=yahoo)
+    closes.columns = symbols
+    return closes.dropna(axis=1, how="all").ffill().dropna(axis=0, how="any")
+
+
+def load_returns(symbols: list, window: str, index_symbol: str):
+    """
+    Returns (dates, asset_returns[T x N], index_returns[T], available_symbols),
+    cached in Redis by (symbol set, window, index) so any weighting reuses it.
+    """
+    cache = RedisCache()
+    cache_key = f"portfolio_returns:{window}:{index_symbol}:{','.join(sorted(symbols))}"
+    with metrics.timed("redis_get"):
+        cached = cache.get(cache_key)
+    metrics.record_cache("portfolio_returns", bool(cached))
+
+    if cached:
+        columns = cached["symbols"]
+        matrix = np.asarray(cached["returns"], dtype=float)
+        dates = cached["dates"]
+    else:
+        closes = fetch_aligned_closes(list(dict.fromkeys(symbols + [index_symbol])), window)
+        if index_symbol not in closes.columns:
+            raise ValueError(f"No data found for index {index_symbol}")
+        if closes.shape[0] < 3:
+            raise ValueError("Not enough overlapping history to compute analytics")
+        prices = closes.to_numpy(dtype=float)
+        matrix = prices[1:] / prices[:-1] - 1.0
+        columns = list(closes.columns)
+        dates = [ts.isoformat() for ts in closes.index[1:]]
+        with metrics.timed("redis_set"):
+            cache.set(cache_key, {"symbols": columns, "returns": matrix.round(10).tolist(), "dates": dates},
+                      ttl_seconds=RETURNS_TTL_SECONDS)
+
+    idx = columns.index(index_symbol)
+    available = [s for s in symbols if s in columns]
+    asset_cols = [columns.index(s) for s in available]
+    return dates, matrix[:, asset_cols], matrix[:, idx], available
+
+
+def max_drawdown(returns: np.ndarray) -> np.ndarray:
+    """Maximum peak-to-trough decline of compounded returns, column-wise."""
+    wealth = np.cumprod(1.0 + returns, axis=0)
+    peaks = np.maximum.accumulate(wealth, axis=0)
+    return (wealth / peaks - 1.0).min(axis=0)
+
+
+def compute_analytics(asset_returns: np.ndarray, index_returns: np.ndarray, weights: np.ndarray) -> dict:
+    """
+    Vectorized risk/return statistics for a T x N matrix of daily returns.
+    Annualization assumes 252 trading days; VaR/CVaR are 1-day historical.
+    """
+    mean = asset_returns.mean(axis=0)
+    cov = np.cov(asset_returns, rowvar=False, ddof=1).reshape(len(weights), len(weights))
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where(np.outer(std, std) > 0, cov / np.outer(std, std), 0.0)
+
+    centered = asset_returns - mean
+    index_centered = index_returns - index_returns.mean()
+    index_var = index_centered @ index_centered
+    betas = centered.T @ index_centered / index_var if index_var > 0 else np.zeros(len(weights))
+
+    portfolio = asset_returns @ weights
+    var_95, var_99 = -np.percentile(portfolio, [5, 1])
+    tail = portfolio[portfolio <= -var_95]
+
+    return {
+        "assets": {
+            "annual_return": mean * TRADING_DAYS,
+            "annual_volatility": std * np.sqrt(TRADING_DAYS),
+            "beta": betas,
+            "max_drawdown": max_drawdown(asset_returns),
+        },
+        "portfolio": {
+            "annual_return": float(portfolio.mean() * TRADING_DAYS),
+            "annual_volatility": float(np.sqrt(weights @ cov @ weights * TRADING_DAYS)),
+            "beta": float(weights @ betas),
+            "max_drawdown": float(max_drawdown(portfolio[:, None])[0]),
+            "var_95": float(var_95),
+            "var_99": float(var_99),
+            "cvar_95": float(-tail.mean()),
+        },
+        "covariance": cov * TRADING_DAYS,
+        "correlation": corr,
+    }
+
+
+def portfolio_analytics(symbols: list, weights: list = None, window: str = "1y",
+                        index_symbol: str = DEFAULT_INDEX) -> dict:
+    """
+    Computes portfolio analytics for the given symbols and weights.
+
+    Args:
+        symbols (list): Ticker symbols (e.g. ["RELIANCE", "TCS"]).
+        weights (list): Non-negative (long-only) portfolio weights, normalized to sum to 1.
+                        Defaults to equal weights.
+        window (str): Lookback period, one of WINDOWS.
+        index_symbol (str): Benchmark for beta. Defaults to NIFTY 50.
+
+    Returns:
+        dict: JSON-serializable analytics. Symbols without data are listed under "missing"
+              and the remaining weights are renormalized.
+
+    Raises:
+        ValueError: If no usable data is found or the weights are not long-only.
+    """
+    weights = np.full(len(symbols), 1.0 / len(symbols)) if weights is None else np.asarray(weights, dtype=float)
+    dates, asset_returns, index_returns, available = load_returns(symbols, window, index_symbol)
+    if not available:
+        raise ValueError("No price data found for the requested symbols")
+
+    keep = np.array([symbols.index(s) for s in available])
+    w = weights[keep]
+    if (w < 0).any() or w.sum() <= 0:
+        raise ValueError("Weights of the available symbols must be non-negative with a positive sum")
+    w = w / w.sum()
+
+    stats = compute_analytics(asset_returns, index_returns, w)
+
+    def r(x):
+        return np.round(x, 6).tolist()
+
+    return {
+        "symbols": available,
+        "missing": [s for s in symbols if s not in available],
+        "weights": r(w),
+        "window": window,
+        "index": index_symbol,
+        "observations": len(dates),
+        "start": dates[0],
+        "end": dates[-1],
+        "assets": {
+            sym: {name: round(float(values[i]), 6) for name, values in stats["assets"].items()}
+            for i, sym in enumerate(available)
+        },
+        "portfolio": {name: round(value, 6) for name, value in stats["portfolio"].items()},
+        "covariance": r(stats["covariance"]),
+        "correlation": r(stats["correlation"]),
+    }
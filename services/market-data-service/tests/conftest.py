@@ -0,0 +1,31 @@
+# services/market-data-service/tests/conftest.py
+#
+# Tests import the service's modules the same way `python app.py` does. yfinance
+# resolves to the replay stand-in in loadtest/standins and Redis to fakeredis,
+# so the suite runs without network access.
+
+import os
+import sys
+import fakeredis
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(os.path.dirname(SERVICE_DIR))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.join(ROOT, "loadtest", "standins"))
+os.environ["FAKE_YF_LATENCY_MS"] = "0"
+
+import cache  # noqa: E402
+
+# RedisCache is a process-wide singleton; install a fakeredis-backed instance
+# before any service module creates the real one.
+_fake_cache = object.__new__(cache.RedisCache)
+_fake_cache.client = fakeredis.FakeRedis(decode_responses=True)
+_fake_cache.is_connected = True
+cache.RedisCache._instance = _fake_cache
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    _fake_cache.client.flushall()
+    return _fake_cache.client
@@ -0,0 +1,146 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance
+
+import data_fetcher
+from data_fetcher import (BarBuffer, RESAMPLE_INTERVALS, _epoch_seconds, fetch_bars, fetch_stock_data,
+                          resample_ohlcv)
+
+IST_OFFSET = 19800
+
+
+@pytest.fixture(autouse=True)
+def empty_buffers():
+    data_fetcher._bar_buffers.clear()
+    data_fetcher._pending_buffers.clear()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Records the period of every upstream 1-minute fetch."""
+    calls = []
+    history = data_fetcher._history
+
+    def spy(full_symbol, period, interval):
+        calls.append(period)
+        return history(full_symbol, period, interval)
+
+    monkeypatch.setattr(data_fetcher, "_history", spy)
+    return calls
+
+
+def _arrays(hist: pd.DataFrame) -> dict:
+    return {"ts": _epoch_seconds(hist.index), "open": hist["Open"].to_numpy(), "high": hist["High"].to_numpy(),
+            "low": hist["Low"].to_numpy(), "close": hist["Close"].to_numpy(), "volume": hist["Volume"].to_numpy()}
+
+
+def _sessions(buffer: BarBuffer) -> int:
+    return len(np.unique((buffer.ts + buffer.utc_offset) // 86400))
+
+
+@pytest.mark.parametrize("interval", ["15m", "60m", "90m"])
+def test_resample_matches_pandas_anchored_at_open(interval):
+    hist = yfinance.Ticker("TCS.NS").history(period="2d", interval="1m")
+    step = RESAMPLE_INTERVALS[interval]
+    ours = resample_ohlcv(_arrays(hist), step, IST_OFFSET)
+
+    expected = hist.resample(f"{step}s", origin="start_day", offset="15min").agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}).dropna()
+    np.testing.assert_array_equal(ours["ts"], _epoch_seconds(expected.index))
+    for name in ("Open", "High", "Low", "Close", "Volume"):
+        np.testing.assert_allclose(ours[name.lower()], expected[name].to_numpy())
+
+
+def test_merge_keeps_latest_values_in_time_order():
+    hist = yfinance.Ticker("TCS.NS").history(period="1d", interval="1m")
+    buffer = BarBuffer(capacity=300)
+    buffer.merge(hist.iloc[:200], days=1)
+    revised = hist.iloc[150:].copy()
+    revised["Close"] += 1.0
+    buffer.merge(revised, days=1)
+
+    assert len(buffer.ts) == 300
+    assert np.all(np.diff(buffer.ts) > 0)
+    assert buffer.ts[-1] == _epoch_seconds(hist.index)[-1]
+    np.testing.assert_allclose(buffer.close[-225:], revised["Close"].to_numpy())
+    np.testing.assert_allclose(buffer.close[:75], hist["Close"].to_numpy()[75:150])
+    assert buffer.utc_offset == IST_OFFSET
+
+
+def test_merge_replace_drops_old_bars():
+    hist = yfinance.Ticker("TCS.NS").history(period="5d", interval="1m")
+    buffer = BarBuffer()
+    buffer.merge(hist, days=5)
+    buffer.merge(hist.iloc[-10:], days=1, replace=True)
+    assert len(buffer.ts) == 10
+    assert buffer.covered_days == 1
+
+
+def test_coarser_intervals_reuse_the_buffer(upstream):
+    fetch_bars("TCS", period="5d", interval="1m")
+    five = fetch_bars("TCS", period="5d", interval="5m")["bars"]
+    fetch_bars("TCS", period="1d", interval="15m")
+    assert upstream == ["5d"]
+    assert len(five) == 5 * 75
+
+
+def test_stale_buffer_tops_up_one_missing_session(upstream):
+    fetch_bars("TCS", period="5d", interval="15m")
+    buffer = data_fetcher._bar_buffers["TCS.NS"]
+    # Drop the newest session, as if the buffer was filled the previous trading day
+    day = (buffer.ts + buffer.utc_offset) // 86400
+    keep = day < day[-1]
+    buffer.ts, buffer.open, buffer.high, buffer.low, buffer.close, buffer.volume = (
+        c[keep] for c in (buffer.ts, buffer.open, buffer.high, buffer.low, buffer.close, buffer.volume))
+    buffer.fetched_at = 0
+
+    bars = fetch_bars("TCS", period="5d", interval="15m")["bars"]
+    assert upstream == ["5d", "2d"]
+    assert _sessions(buffer) == 5
+    assert len(bars) == 5 * 25
+
+
+def test_week_stale_buffer_is_replaced(upstream):
+    fetch_bars("TCS", period="5d", interval="15m")
+    buffer = data_fetcher._bar_buffers["TCS.NS"]
+    buffer.ts = buffer.ts - 7 * 86400  # same weekdays, one week earlier
+    buffer.fetched_at = 0
+
+    fetch_bars("TCS", period="5d", interval="15m")
+    assert upstream == ["5d", "5d"]
+    assert _sessions(buffer) == 5  # no week-old sessions left behind
+
+
+def test_concurrent_first_requests_share_one_fetch(upstream, monkeypatch):
+    monkeypatch.setattr(yfinance, "LATENCY_SECONDS", 0.05)
+    threads = [threading.Thread(target=fetch_bars, args=("INFY", "5d", "5m")) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert upstream == ["5d"]
+    assert list(data_fetcher._bar_buffers) == ["INFY.NS"]
+
+
+def test_buffers_are_published_only_after_data_and_bounded(monkeypatch):
+    monkeypatch.setattr(data_fetcher, "MAX_BUFFERED_SYMBOLS", 2)
+    with pytest.raises(ValueError):
+        fetch_stock_data("INVALIDX")
+    assert not data_fetcher._bar_buffers and not data_fetcher._pending_buffers
+
+    fetch_stock_data("TCS")
+    fetch_stock_data("INFY")
+    fetch_stock_data("TCS")  # refreshes TCS's LRU position
+    fetch_stock_data("SBIN")
+    assert list(data_fetcher._bar_buffers) == ["TCS.NS", "SBIN.NS"]
+
+
+def test_latest_quote_is_the_last_bar():
+    quote = fetch_stock_data("TCS")
+    last = fetch_bars("TCS")["bars"][-1]
+    assert quote["timestamp"] == last["timestamp"]
+    assert quote["timestamp"].endswith("15:29:00+05:30")
+    assert (quote["open"], quote["high"], quote["low"], quote["latest_close"], quote["volume"]) == \
+        (last["open"], last["high"], last["low"], last["close"], last["volume"])
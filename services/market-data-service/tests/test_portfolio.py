@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio
+from app import app
+from portfolio import TRADING_DAYS, compute_analytics, max_drawdown, portfolio_analytics
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(7)
+    index = rng.normal(0.0005, 0.01, 250)
+    assets = np.column_stack([0.8 * index + rng.normal(0, 0.008, 250),
+                              1.3 * index + rng.normal(0, 0.012, 250),
+                              rng.normal(0.001, 0.02, 250)])
+    return assets, index
+
+
+def test_compute_analytics_matches_pandas(returns):
+    assets, index = returns
+    weights = np.array([0.5, 0.3, 0.2])
+    stats = compute_analytics(assets, index, weights)
+
+    frame = pd.DataFrame(assets)
+    np.testing.assert_allclose(stats["covariance"], frame.cov().to_numpy() * TRADING_DAYS)
+    np.testing.assert_allclose(stats["correlation"], frame.corr().to_numpy())
+    np.testing.assert_allclose(stats["assets"]["annual_volatility"], frame.std().to_numpy() * np.sqrt(TRADING_DAYS))
+    betas = [np.cov(assets[:, i], index)[0, 1] / np.var(index, ddof=1) for i in range(3)]
+    np.testing.assert_allclose(stats["assets"]["beta"], betas)
+
+    daily = assets @ weights
+    assert stats["portfolio"]["annual_volatility"] == pytest.approx(daily.std(ddof=1) * np.sqrt(TRADING_DAYS))
+    assert stats["portfolio"]["beta"] == pytest.approx(np.cov(daily, index)[0, 1] / np.var(index, ddof=1))
+    assert stats["portfolio"]["var_95"] == pytest.approx(-np.percentile(daily, 5))
+    assert stats["portfolio"]["cvar_95"] >= stats["portfolio"]["var_95"]
+
+
+def test_compute_analytics_single_asset(returns):
+    assets, index = returns
+    stats = compute_analytics(assets[:, :1], index, np.array([1.0]))
+    assert stats["covariance"].shape == (1, 1)
+    assert stats["correlation"][0, 0] == pytest.approx(1.0)
+
+
+def test_max_drawdown():
+    returns = np.array([[0.10, 0.0], [-0.50, 0.0], [0.20, 0.0]])
+    np.testing.assert_allclose(max_drawdown(returns), [-0.5, 0.0])
+
+
+def test_portfolio_analytics_normalizes_weights():
+    result = portfolio_analytics(["TCS", "INFY"], [3, 1], window="6mo")
+    assert result["weights"] == [0.75, 0.25]
+    assert result["missing"] == []
+    assert result["observations"] > 100
+
+
+def test_portfolio_analytics_renormalizes_over_available_symbols():
+    result = portfolio_analytics(["TCS", "INVALID1", "INFY"], [1, 2, 1], window="3mo")
+    assert result["symbols"] == ["TCS", "INFY"]
+    assert result["missing"] == ["INVALID1"]
+    assert result["weights"] == [0.5, 0.5]
+
+
+def test_portfolio_analytics_rejects_short_weights():
+    with pytest.raises(ValueError):
+        portfolio_analytics(["TCS", "INFY"], [1, -2], window="3mo")
+
+
+def test_load_returns_is_cached(monkeypatch):
+    portfolio_analytics(["TCS", "INFY"], window="3mo")
+    monkeypatch.setattr(portfolio, "fetch_aligned_closes", lambda *a: pytest.fail("expected a cache hit"))
+    assert portfolio_analytics(["INFY", "TCS"], [1, 3], window="3mo")["weights"] == [0.25, 0.75]
+
+
+@pytest.mark.parametrize("body", [
+    {"symbols": ["TCS", "INFY"], "weights": [-1, -1]},
+    {"symbols": ["TCS", "INFY"], "weights": [1, -2]},
+    {"symbols": ["TCS", "INFY"], "weights": [0, 0]},
+    {"symbols": ["TCS", "INFY"], "weights": ["nan", 1]},
+    {"symbols": ["TCS", "INFY"], "weights": [1]},
+    {"symbols": ["TCS", "INFY"], "index": 5},
+    {"symbols": ["TCS", "INFY"], "index": " "},
+    {"symbols": ["TCS"], "window": "10y"},
+    {"symbols": [" "]},
+    {"symbols": [1, 2]},
+])
+def test_route_rejects_invalid_input(body):
+    res = app.test_client().post("/portfolio/analytics", json=body)
+    assert res.status_code == 400
+    assert "error" in res.get_json()
+
+
+def test_route_ignores_blank_symbols():
+    res = app.test_client().post("/portfolio/analytics", json={"symbols": ["TCS", " ", ""], "window": "3mo"})
+    assert res.status_code == 200
+    assert res.get_json()["symbols"] == ["TCS"]